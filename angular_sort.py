@@ -0,0 +1,1417 @@
+import io
+import sys
+import math
+import heapq
+import queue
+import argparse
+import threading
+import tracemalloc
+from functools import partial
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import point_set
+from metrics import NO_METRICS, PROFILERS, Metrics, run_profiled
+from result_cache import DEFAULT_CACHE_SIZE, ResultCache
+from external_sort import ExternalSorter, chunk_bytes, parse_memory_limit, record_blocks
+from point_loader import load_points, iter_points, read_ahead
+from point_writer import write_points
+from point_file import write_point_file, write_point_blocks
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for --engine=numpy
+    np = None
+
+
+def compute_angle(x, y):
+    """
+    Computes the angle (in radians) between the point (x, y) and the x-axis.
+    :param x: x-coordinate
+    :param y: y-coordinate
+    :return: Angle in radians
+    """
+    # Calculates the vector magnitude. Point is at the origin if 0.
+    vector_magnitude = math.sqrt(x ** 2 + y ** 2)
+    if vector_magnitude == 0:
+        raise ValueError("Cannot calculate theta for point at origin (0, 0)")
+
+    # Calculates the degree of the angle
+    cosine_theta = x / vector_magnitude
+    degree = math.acos(cosine_theta)
+
+    # if in Quad 3 or 4
+    if y < 0:
+        degree = 2 * math.pi - degree
+
+    return degree
+
+
+class Point(point_set.Point):
+    __slots__ = ()
+
+    def compute_degree(self):
+        """
+        Computes the angle (in radians) between the point and the x-axis.
+        :return: Angle in radians
+        """
+        return compute_angle(self.get_x(), self.get_y())
+
+    def __le__(self, other):
+        """
+        Defines the `<=` operator based on the computed degree.
+        :param other: Another Point
+        :return: True if this point's degree is less than or equal to the other's degree
+        """
+        return self.compute_degree() < other.compute_degree() or\
+            self.compute_degree() == other.compute_degree()
+
+    def __lt__(self, other):
+        """
+        Defines the `<` operator based on the computed degree.
+        :param other: Another Point
+        :return: True if this point's degree is less than the other's degree
+        """
+        return self.compute_degree() < other.compute_degree()
+
+    def __gt__(self, other):
+        """
+        Defines the `>` operator based on the computed degree.
+        :param other: Another Point
+        :return: True if this point's degree is greater than the other's degree
+        """
+        return self.compute_degree() > other.compute_degree()
+
+    def __ge__(self, other):
+        """
+        Defines the `>=` operator based on the computed degree.
+        :param other: Another Point
+        :return: True if this point's degree is greater than or equal to the other's degree
+        """
+        return self.compute_degree() > other.compute_degree() or\
+            self.compute_degree() == other.compute_degree()
+
+    def __eq__(self, other):
+        """
+        Defines the `==` operator based on the computed degree.
+        :param other: Another Point
+        :return: True if this point's degree is equal to the other's degree
+        """
+        return self.compute_degree() == other.compute_degree()
+
+
+TRACE_LEVELS = ("off", "summary", "full")
+TRACE_BUFFER_SIZE = 1 << 20  # Bytes buffered before the information file is written to
+TRACE_CHUNK_LINES = 4096  # Lines handed to the writer thread at a time
+
+MIN_RUN = 32  # Minimum sub-array size for insertion sort
+MIN_GALLOP = 7  # Consecutive wins by one run before merge() switches to galloping
+# Largest difference between a NumPy angle and compute_angle()'s, in units of the angle's error
+# terms (1 / sine, the angle itself and 1); 16 roundings covers squaring, arccos and 2 pi - angle
+ANGLE_ERROR_BOUND = 16 * sys.float_info.epsilon
+# Peak bytes per byte of point text while a --memory-limit chunk is sorted: its keys and order
+# are lists of Python objects, and its runs are spilled as four columns
+EXTERNAL_BYTES_PER_INPUT_BYTE = 16
+STREAM_BLOCK_BYTES = 1 << 16  # Bytes of input parsed at a time by --stream
+STREAM_BLOCKS_AHEAD = 16  # Parsed blocks the --stream reader may get ahead of the sort
+# Options that change the sorted output or the information file, and so are part of a --cache key
+CACHED_OPTIONS = ("trace", "engine", "merge", "gallop", "adaptive_minrun", "descending_runs", "workers",
+                  "output_format", "memory_limit")
+
+
+class TimsortTrace:
+
+    def __init__(self, path=None, level="full", threaded=False, stream=None):
+        """
+        Writes the TimSort information file.
+        Callers check `full` before formatting a per-run or per-merge line, so a trace that is off
+        or summary-only costs no formatting or I/O inside the scanning and merging loops.
+        :param path: Information file to write; not opened when level is "off"
+        :param level: "off" writes nothing, "summary" only the totals, "full" the whole trace
+        :param threaded: Hand the lines to a background writer thread instead of writing them inline
+        :param stream: Text stream to write to instead of opening path, e.g. an io.StringIO
+        """
+        self.full = level == "full"  # Write every run and merge
+        self.summary = level != "off"  # Write the totals
+        self.file = None
+        if self.summary:
+            self.file = stream if stream is not None else open(path, "w", buffering=TRACE_BUFFER_SIZE)
+        self.queue = None
+        if self.summary and threaded:
+            self.pending = []  # Lines not yet handed to the writer thread
+            self.queue = queue.Queue(maxsize=64)
+            self.writer = threading.Thread(target=self.write_chunks, daemon=True)
+            self.writer.start()
+
+    def write(self, text):
+        """
+        Writes text to the information file.
+        :param text: Text to write
+        """
+        if self.queue is None:
+            self.file.write(text)
+            return
+        self.pending.append(text)
+        if len(self.pending) >= TRACE_CHUNK_LINES:
+            self.queue.put("".join(self.pending))
+            self.pending = []
+
+    def write_chunks(self):
+        """
+        Body of the writer thread: writes chunks until close() sends None.
+        """
+        while (chunk := self.queue.get()) is not None:
+            self.file.write(chunk)
+
+    def close(self):
+        """
+        Writes out anything still buffered and closes the information file.
+        """
+        if self.queue is not None:
+            self.queue.put("".join(self.pending))
+            self.queue.put(None)
+            self.writer.join()
+        if self.file is not None:
+            self.file.close()
+
+
+NO_TRACE = TimsortTrace(level="off")  # Default for sorting without an information file
+
+
+class MergeState:
+
+    def __init__(self):
+        """
+        Holds the state TimSort carries from one merge to the next.
+        min_gallop adapts to the data: it drops while galloping pays off and rises when it does not.
+        """
+        self.min_gallop = MIN_GALLOP
+        self.comparisons = 0  # Element comparisons made by the whole sort
+        self.gallops = 0  # Times a merge entered galloping mode
+        self.shifts = 0  # Elements insertion sort moved one place to the right
+        self.moves = 0  # Elements merges copied into the array or into the scratch buffer
+        self.scratch_points = []  # Scratch buffer shared by every merge of the sort
+        self.scratch_keys = []  # Keys of the elements in scratch_points
+
+    def copy_to_scratch(self, array, keys, start, length):
+        """
+        Copies array[start:start + length] and its keys into the scratch buffers.
+        The buffers only grow, to the longest run a merge has had to copy, so a sort allocates
+        them once instead of allocating a merged list per merge.
+        :param array: Array being sorted
+        :param keys: Keys parallel to array
+        :param start: First index to copy
+        :param length: Number of elements to copy
+        :return: The scratch buffers for the elements and for their keys
+        """
+        if length > len(self.scratch_points):
+            growth = [None] * (length - len(self.scratch_points))
+            self.scratch_points.extend(growth)
+            self.scratch_keys.extend(growth)
+        self.scratch_points[:length] = array[start:start + length]
+        self.scratch_keys[:length] = keys[start:start + length]
+        return self.scratch_points, self.scratch_keys
+
+
+def compute_min_run(arr_len):
+    """
+    Computes the minimum run length for an array the way CPython's listsort does: a value in
+    [32, 64] such that arr_len / min_run is a power of two or slightly less than one.
+    :param arr_len: Length of the array to sort
+    :return: Minimum run length
+    """
+    remainder = 0  # Becomes 1 if any bit is shifted off
+    while arr_len >= 64:
+        remainder |= arr_len & 1
+        arr_len >>= 1
+    return arr_len + remainder
+
+
+def compute_keys(points, metrics=NO_METRICS):
+    """
+    Computes the sort key (angle in radians) of every point exactly once.
+    :param points: PointSet
+    :param metrics: Metrics counting the angle computations
+    :return: List of angles, parallel to the point indices
+    """
+    metrics.count("compute_degree_calls", len(points))
+    return list(map(compute_angle, points.xs, points.ys))
+
+
+def timsort(points, keys=None, gallop=False, adaptive_min_run=False, descending_runs=False, buffered=True,
+            trace=NO_TRACE, metrics=NO_METRICS, read_more=None):
+    """
+    Performs TimSort on the given array of points.
+    TimSort is a hybrid sorting algorithm derived from Merge Sort and Insertion Sort.
+    It sorts small chunks using Insertion Sort and then merges them using a stack-based merging strategy.
+    The optional modes follow CPython's listsort; they change the trace, so all default to off.
+    :param points: List of Point objects, or of point indices, to be sorted
+    :param keys: Optional list of precomputed angles parallel to points (see compute_keys).
+                 When given, the sort compares plain floats and keeps keys in step with points.
+    :param gallop: Merge with galloping (exponential search) once one run keeps winning
+    :param adaptive_min_run: Compute the minimum run length from the array length instead of using 32
+    :param descending_runs: Reverse strictly descending runs in place instead of insertion sorting them
+    :param buffered: Merge through one reusable scratch buffer (buffered_merge) instead of a new list per merge
+    :param trace: TimsortTrace the runs and merges are logged to
+    :param metrics: Metrics the sort's counters and the time spent merging are added to
+    :param read_more: For input that is still arriving, a callable appending the next block of
+                      points to points and keys, and returning False once the input has ended.
+                      Runs are detected and merged as soon as their elements have arrived; only
+                      the final merges wait for the end of the input. Cannot be combined with
+                      adaptive_min_run, which needs the final length.
+    """
+    if keys is None:
+        keys = points  # Without precomputed keys, compare the points themselves
+    if read_more is None:
+        read_more = lambda: False  # All of the input is there already
+    state = MergeState()
+    # Merges two adjacent runs of points in place
+    merge_function = gallop_merge if gallop else buffered_merge if buffered else merge
+    merge_runs = metrics.timed("merge", partial(merge_function, points, keys=keys, state=state))
+    runs = []  # Stack to manage merging runs
+    total_runs = 0  # Counter for total runs found
+    total_merges = 0  # Counter for total merges performed
+    arr_len = len(points)  # Length of the array, points
+    min_run = compute_min_run(arr_len) if adaptive_min_run else MIN_RUN
+    if trace.full:
+        trace.write("scanning phase:\n")
+
+    index = 0  # Initialize index for scanning the array
+    while True:
+        while arr_len < index + min_run and read_more():
+            arr_len = len(points)  # Wait for a whole minimum run, unless the input ends first
+        if index >= arr_len:
+            break
+        start = index  # Mark the starting index of a run
+        end = min(index + min_run, arr_len) - 1  # Determine the minimum endpoint of the run
+
+        if descending_runs:
+            # A strictly descending run becomes ascending by reversing it, without breaking stability
+            run_end = count_descending_run(keys, start, arr_len, state, read_more)
+            arr_len = len(points)
+            if run_end > start:
+                points[start:run_end + 1] = points[run_end:start - 1 if start else None:-1]
+                if keys is not points:
+                    keys[start:run_end + 1] = keys[run_end:start - 1 if start else None:-1]
+                end = max(end, run_end)
+
+        # Sort this small section using insertion sort
+        insertion_sort(points, start, end, keys, state)
+
+        # Extend the run if adjacent elements continue increasing
+        sorted_end = end
+        while True:
+            while end + 1 < arr_len and keys[end] <= keys[end + 1]:
+                end += 1
+            if end + 1 < arr_len or not read_more():
+                break
+            arr_len = len(points)  # The run reached the last element so far; it may go on
+        state.comparisons += end - sorted_end + (end + 1 < arr_len)
+
+        # Store the run's start index and size in the list
+        runs.append((start, end - start + 1))
+        total_runs += 1  # Increment the run counter
+        index = end + 1  # Move to the next potential run
+        if trace.full:
+            trace.write(f"run: [{start}, {end - start + 1}]\n")
+
+        # Check and maintain the TimSort merging invariant
+        total_merges += fix_invariant(runs, merge_runs, trace)
+
+    total_merges += merge_remaining_runs(runs, merge_runs, trace)
+
+    # Log final statistics
+    write_totals(trace, total_runs, total_merges)
+    if trace.summary and (gallop or adaptive_min_run or descending_runs):
+        trace.write(f"total number of comparisons = {state.comparisons}\n")
+        trace.write(f"total number of gallops = {state.gallops}\n")
+    metrics.count("runs", total_runs)
+    metrics.count("merges", total_merges)
+    metrics.count("comparisons", state.comparisons)
+    metrics.count("insertion_shifts", state.shifts)
+    metrics.count("merge_moves", state.moves)
+    metrics.count("gallops", state.gallops)
+    return points
+
+
+def count_descending_run(keys, start, arr_len, state, read_more=None):
+    """
+    Finds the strictly descending run starting at start.
+    :param keys: Keys of the array being sorted
+    :param start: Index the run starts at
+    :param arr_len: Length of the array
+    :param state: MergeState counting comparisons
+    :param read_more: Appends more keys while the input is still arriving; see timsort()
+    :return: Index of the last element of the run (start if the run is not descending)
+    """
+    end = start
+    while True:
+        while end + 1 < arr_len and keys[end + 1] < keys[end]:
+            end += 1
+        if end + 1 < arr_len or read_more is None or not read_more():
+            break
+        arr_len = len(keys)
+    state.comparisons += end - start + (end + 1 < arr_len)
+    return end
+
+
+def fix_invariant(runs, merge_runs, trace):
+    """
+    Merges runs on top of the stack until the TimSort merging invariant holds again.
+    :param runs: Stack of (start, length) runs
+    :param merge_runs: Called as merge_runs(left_bound, middle, right_bound) to merge two adjacent runs
+    :param trace: TimsortTrace the merges are logged to
+    :return: Number of merges performed
+    """
+    merges = 0
+    while len(runs) >= 3:  # Ensure there are at least 3 runs for merging
+        x_start, x_len = runs[-1]  # Retrieve the most recent run
+        y_start, y_len = runs[-2]  # Retrieve the second most recent run
+        z_start, z_len = runs[-3]  # Retrieve the third most recent run
+
+        if z_len < x_len + y_len:  # Check if the merging invariant is violated
+            temp_item = runs.pop()  # Removes x
+            runs.pop()  # Remove y
+            runs.pop()  # Removes z
+
+            merge_runs(z_start, z_start + z_len - 1, y_start + y_len - 1)  # Merge runs
+            if trace.full:
+                trace.write(f"fixing invariant 1: merging runs [{z_start}, {z_len}] [{y_start}, {y_len}]\n")
+            merges += 1  # Increment merge counter
+
+            runs.append((z_start, z_len + y_len))  # Push the merged run back onto the stack
+            runs.append(temp_item)  # Add x back to the stack
+        elif y_len < x_len:
+            runs.pop()  # Removes x
+            runs.pop()  # Removes y
+            merge_runs(y_start, y_start + y_len - 1, x_start + x_len - 1)  # Merge runs
+
+            if trace.full:
+                trace.write(f"fixing invariant 2: merging runs [{y_start}, {y_len}] [{x_start}, {x_len}]\n")
+            merges += 1  # Increment merge counter
+            runs.append((y_start, y_len + x_len))  # Push the merged run back onto the stack
+        else:
+            break  # Stop merging if the invariant holds
+    return merges
+
+
+def merge_remaining_runs(runs, merge_runs, trace):
+    """
+    Logs the stack left by the scanning phase and merges it down to a single run.
+    :param runs: Stack of (start, length) runs
+    :param merge_runs: Called as merge_runs(left_bound, middle, right_bound) to merge two adjacent runs
+    :param trace: TimsortTrace the stack and merges are logged to
+    :return: Number of merges performed
+    """
+    merges = 0
+    if trace.full:
+        trace.write("after scanning phase, stack contents are\n")
+        for item in reversed(runs):  # prints stack contents in runs
+            trace.write(f"[{item[0]}, {item[1]}]\n")
+        trace.write("\nbottom-up merging phase:\n")  # Log start of bottom-up merging phase
+
+    # Merge remaining runs while maintaining invariant
+    temp_runs = []
+    while len(runs) > 1:  # Continue until only one fully merged run remains
+        top1_start, top1_len = runs.pop()  # Remove the topmost run
+        top2_start, top2_len = runs.pop()  # Remove the second topmost run
+
+        merge_runs(top2_start, top2_start + top2_len - 1, top2_start + top2_len + top1_len - 1)  # Merge top two runs
+        if trace.full:
+            trace.write(f"merging runs [{top2_start}, {top2_len}] [{top1_start}, {top1_len}]\n")  # Log merging
+        merges += 1  # Increment merge counter
+        temp_runs.append((top2_start, top2_len + top1_len))  # Push the merged run back onto the stack
+
+        # Refill runs with the stack from temp_runs
+        if len(runs) <= 1:
+            while len(temp_runs) > 0:  # loops until stack is empty
+                temp_start, temp_len = temp_runs.pop()
+                runs.append((temp_start, temp_len))  # takes from top of temp_runs and puts back in runs
+    return merges
+
+
+def write_totals(trace, total_runs, total_merges):
+    """
+    Logs the final TimSort statistics.
+    :param trace: TimsortTrace the totals are logged to
+    :param total_runs: Number of runs found in the scanning phase
+    :param total_merges: Number of merges performed in both phases
+    """
+    if trace.full:
+        trace.write("\n")  # Separates the totals from the bottom-up merging phase
+    if trace.summary:
+        trace.write(f"total number of runs found = {total_runs}\n")  # Log total runs detected
+        trace.write(f"total number of merges performed = {total_merges}\n")  # Log total merges performed
+
+
+def numpy_angles(xs, ys):
+    """
+    Computes the angle (in radians) of every point, equal to compute_angle()'s for every point.
+    Mirrors compute_angle() operation for operation rather than using arctan2: arctan2 rounds
+    points on a common ray to the same angle where acos does not, which would reorder such ties.
+    NumPy's exact x * x and SIMD arccos can still differ in the last bits from Python's pow() and
+    math.acos, so every angle gets an error bound. An angle whose bound overlaps no other angle's
+    bound compares with every other angle as the exact one would; the few others are recomputed
+    with compute_angle(), so the sort and its trace come out exactly as with Point objects.
+    :param xs: NumPy array of x-coordinates
+    :param ys: NumPy array of y-coordinates
+    :return: NumPy array of angles, parallel to xs and ys
+    """
+    with np.errstate(over="ignore"):  # compute_angle() raises OverflowError for these points below
+        squared_magnitudes = np.square(xs) + np.square(ys)
+    vector_magnitudes = np.sqrt(squared_magnitudes)
+    if np.any(vector_magnitudes == 0):
+        raise ValueError("Cannot calculate theta for point at origin (0, 0)")
+
+    angles = np.arccos(xs / vector_magnitudes)
+    quad_3_or_4 = ys < 0
+    angles[quad_3_or_4] = 2 * math.pi - angles[quad_3_or_4]
+
+    # acos magnifies a difference in the cosine by 1 / sine, so the bound is widest near the x-axis
+    with np.errstate(divide="ignore", over="ignore"):
+        errors = ANGLE_ERROR_BOUND * (vector_magnitudes / np.abs(ys) + angles + 1)
+    order = np.argsort(angles)
+    lows = angles[order] - errors[order]
+    highs = angles[order] + errors[order]
+    # A bound overlaps another if an earlier angle's bound reaches above its low end or a later
+    # angle's bound reaches below its high end
+    reached_from_below = np.concatenate(([-math.inf], np.fmax.accumulate(highs)[:-1])) >= lows
+    reached_from_above = np.concatenate((np.fmin.accumulate(lows[::-1])[::-1][1:], [math.inf])) <= highs
+    inexact = order[reached_from_below | reached_from_above]
+    # Squares that overflow or lose precision below the normal range have no bound; nor does NaN
+    unbounded = ~((squared_magnitudes >= sys.float_info.min) & (squared_magnitudes <= sys.float_info.max))
+    inexact = np.union1d(inexact, np.flatnonzero(unbounded))
+    angles[inexact] = list(map(compute_angle, xs[inexact].tolist(), ys[inexact].tolist()))
+    return angles
+
+
+def replay_timsort(keys, trace):
+    """
+    Writes the trace timsort() would write for keys without moving any elements.
+    Runs only depend on the unsorted keys: each chunk is extended while its largest key and the
+    keys following it keep increasing, so the run stack is replayed from the key array alone.
+    :param keys: NumPy array of keys in input order
+    :param trace: TimsortTrace the runs and merges are logged to
+    """
+    runs = []  # Stack to manage merging runs
+    total_runs = 0  # Counter for total runs found
+    total_merges = 0  # Counter for total merges performed
+    arr_len = len(keys)  # Length of the array, keys
+    descents = np.flatnonzero(keys[:-1] > keys[1:])  # Indices where the keys stop increasing
+    skip_merge = lambda left_bound, middle, right_bound: None  # Only the run stack is replayed
+    if trace.full:
+        trace.write("scanning phase:\n")
+
+    index = 0  # Initialize index for scanning the array
+    while index < arr_len:
+        start = index  # Mark the starting index of a run
+        end = min(index + MIN_RUN, arr_len) - 1  # Determine the minimum endpoint of the run
+
+        # Extend the run if the sorted chunk and the elements after it continue increasing
+        if end + 1 < arr_len and keys[start:end + 1].max() <= keys[end + 1]:
+            position = np.searchsorted(descents, end + 1)  # First descent at or after end + 1
+            end = int(descents[position]) if position < len(descents) else arr_len - 1
+
+        runs.append((start, end - start + 1))
+        total_runs += 1  # Increment the run counter
+        index = end + 1  # Move to the next potential run
+        if trace.full:
+            trace.write(f"run: [{start}, {end - start + 1}]\n")
+
+        total_merges += fix_invariant(runs, skip_merge, trace)
+
+    total_merges += merge_remaining_runs(runs, skip_merge, trace)
+    write_totals(trace, total_runs, total_merges)
+
+
+def numpy_timsort(points, trace=NO_TRACE, metrics=NO_METRICS):
+    """
+    Sorts points by angle with NumPy: one vectorized angle pass and a stable argsort.
+    TimSort is stable, so the order matches timsort(); its trace is replayed from the keys.
+    :param points: PointSet to be sorted
+    :param trace: TimsortTrace the replayed runs and merges are logged to
+    :param metrics: Metrics the angle computations and the phase timings are added to
+    :return: List of the point indices in sorted order
+    """
+    with metrics.phase("keys"):
+        keys = numpy_angles(*points.numpy())
+    metrics.count("compute_degree_calls", len(keys))
+
+    with metrics.phase("sort"):
+        if trace.summary:
+            replay_timsort(keys, trace)
+        return np.argsort(keys, kind="stable").tolist()
+
+
+def parallel_timsort(points, workers, gallop=False, adaptive_min_run=False, descending_runs=False, buffered=True,
+                     trace=NO_TRACE, metrics=NO_METRICS):
+    """
+    Sorts points by angle on several cores. The points are split into one chunk of consecutive
+    points per worker, timsort() sorts every chunk in a process pool, and the sorted chunks are
+    combined with a k-way merge over their keys. Ties at equal angles are broken by point index,
+    which is what the stable sequential sort does, so the order matches timsort() for any input.
+    :param points: PointSet to be sorted
+    :param workers: Number of worker processes
+    :param gallop: Passed to timsort() for every chunk
+    :param adaptive_min_run: Passed to timsort() for every chunk
+    :param descending_runs: Passed to timsort() for every chunk
+    :param buffered: Passed to timsort() for every chunk
+    :param trace: TimsortTrace the per-worker runs and merges and the final merge are logged to
+    :param metrics: Metrics the counters of every worker are added to
+    :return: List of the point indices in sorted order
+    """
+    arr_len = len(points)
+    workers = max(1, min(workers, arr_len))
+    bounds = [arr_len * worker // workers for worker in range(workers + 1)]
+    level = "full" if trace.full else "summary" if trace.summary else "off"
+    chunks = [points.copy_range(start, stop) for start, stop in zip(bounds, bounds[1:])]
+    with ProcessPoolExecutor(workers) as executor:
+        results = list(executor.map(sort_chunk, [chunk.xs for chunk in chunks], [chunk.ys for chunk in chunks],
+                                    bounds[:-1], [gallop] * workers, [adaptive_min_run] * workers,
+                                    [descending_runs] * workers, [buffered] * workers, [level] * workers,
+                                    [metrics.enabled] * workers))
+
+    # Each worker's information follows the sequential format, with runs relative to its chunk
+    if trace.summary:
+        for worker, (start, stop, (_, _, text, _)) in enumerate(zip(bounds, bounds[1:], results)):
+            trace.write(f"worker {worker}: points [{start}, {stop - start}]\n{text}\n")
+    for *_, counters in results:
+        for name, value in counters.items():
+            metrics.count(name, value)
+
+    # Each chunk is sorted by (key, index); merging on the same pairs keeps the order stable
+    merged = heapq.merge(*(zip(keys, order) for order, keys, *_ in results))
+    if trace.full:
+        trace.write("k-way merge phase:\n")
+        trace.write("merging chunks " + " ".join(f"[{start}, {stop - start}]" for start, stop in zip(bounds, bounds[1:]))
+                    + f" into [0, {arr_len}]\n\n")
+    if trace.summary:
+        trace.write(f"total number of chunks merged = {workers}\n")
+    return [index for _, index in merged]
+
+
+def sort_chunk(xs, ys, start, gallop, adaptive_min_run, descending_runs, buffered, level, collect_metrics):
+    """
+    Sorts one chunk of points by angle; see parallel_timsort().
+    :param xs: array('d') of the chunk's x-coordinates
+    :param ys: array('d') of the chunk's y-coordinates
+    :param start: Index of the chunk's first point
+    :param gallop: Passed to timsort()
+    :param adaptive_min_run: Passed to timsort()
+    :param descending_runs: Passed to timsort()
+    :param buffered: Passed to timsort()
+    :param level: Trace level of the chunk's information
+    :param collect_metrics: Count what the chunk's sort does
+    :return: (point indices in sorted order, their keys, the chunk's TimSort information, its counters)
+    """
+    metrics = Metrics(enabled=collect_metrics)
+    keys = compute_keys(point_set.PointSet(xs, ys), metrics)
+    order = list(range(start, start + len(keys)))
+    trace = TimsortTrace(level=level, stream=io.StringIO())
+    timsort(order, keys, gallop, adaptive_min_run, descending_runs, buffered, trace, metrics)
+    text = trace.file.getvalue() if trace.summary else ""
+    trace.close()
+    return order, keys, text, metrics.counters
+
+
+def external_timsort(input_stream, memory_limit, gallop=False, adaptive_min_run=False, descending_runs=False,
+                     buffered=True, trace=NO_TRACE, metrics=NO_METRICS):
+    """
+    Sorts points that do not fit in memory. The input is read in chunks sized to memory_limit;
+    timsort() sorts every chunk, which is then spilled as a sorted run of (angle, index, x, y)
+    records to a temporary binary file. A buffered k-way merge of the runs yields the output.
+    Equal angles are ordered by point index, so the output matches the in-memory sort.
+    :param input_stream: Binary stream the points are read from, e.g. sys.stdin.buffer
+    :param memory_limit: Bytes the sort may use, roughly
+    :param gallop: Passed to timsort() for every chunk
+    :param adaptive_min_run: Passed to timsort() for every chunk
+    :param descending_runs: Passed to timsort() for every chunk
+    :param buffered: Passed to timsort() for every chunk
+    :param trace: TimsortTrace the per-chunk runs and merges, spills and merge passes are logged to
+    :param metrics: Metrics the counters of every chunk and of the external merge are added to
+    :return: (number of points, generator of (xs, ys) blocks of the sorted points)
+    """
+    sorter = ExternalSorter(4, memory_limit)
+    try:
+        start = 0  # Index of the chunk's first point
+        for chunk, (xs, ys) in enumerate(iter_points(input_stream, chunk_bytes(memory_limit, EXTERNAL_BYTES_PER_INPUT_BYTE))):
+            points = point_set.PointSet(xs, ys)
+            keys = compute_keys(points, metrics)
+            order = list(range(len(points)))
+            if trace.summary:
+                trace.write(f"chunk {chunk}: points [{start}, {len(points)}]\n")
+            timsort(order, keys, gallop, adaptive_min_run, descending_runs, buffered, trace, metrics)
+            if trace.summary:
+                trace.write("\n")
+            sorter.spill([keys, [start + index for index in order], point_set.select(points.xs, order),
+                          point_set.select(points.ys, order)])
+            start += len(points)
+            del points, keys, order  # Freed before the next chunk is read
+
+        records = sorter.merge()
+        if trace.full:
+            trace.write("external merge phase:\n")
+            for merge_pass, runs, output_run in sorter.merges:
+                trace.write(f"merge pass {merge_pass}: merging runs {' '.join(map(str, runs))} into run {output_run}\n")
+            trace.write(f"final merge: merging runs {' '.join(map(str, sorter.runs))} into the output\n\n")
+        if trace.summary:
+            trace.write(f"total number of spilled runs = {sorter.spills}\n")
+            trace.write(f"total number of merge passes = {sorter.passes + 1}\n")
+            trace.write(f"merge fan-in = {sorter.fan_in}\n")
+        metrics.count("spilled_runs", sorter.spills)
+        metrics.count("merge_passes", sorter.passes + 1)
+    except BaseException:
+        sorter.close()
+        raise
+    return start, merged_blocks(records, sorter)
+
+
+def merged_blocks(records, sorter):
+    """
+    Groups the merged records of external_timsort() into blocks of points.
+    :param records: Iterator of (angle, index, x, y) records in sorted order
+    :param sorter: ExternalSorter the records come from; closed once they are exhausted
+    :return: Generator of (xs, ys) tuples of floats
+    """
+    try:
+        yield from record_blocks(records, (2, 3))
+    finally:
+        sorter.close()
+
+
+def merge(array, left_bound, middle, right_bound, keys=None, state=None):
+    """
+    Merge two sorted sub-arrays into a single sorted sub-array.
+    :param array: The original array containing sub-arrays to merge
+    :param left_bound: Left index of the first sub-array
+    :param middle: Middle index separating the two sub-arrays
+    :param right_bound: Right index of the second sub-array
+    :param keys: Optional precomputed keys parallel to array, merged along with it
+    :param state: Optional MergeState counting comparisons
+    """
+    if middle == right_bound:
+        return  # If the two sub-arrays are already merged, return immediately
+    if keys is None:
+        keys = array  # Without precomputed keys, compare the elements themselves
+
+    merged_list = []  # Temporary list to store merged elements
+    merged_keys = []  # Temporary list to store the keys of the merged elements
+    left_pointer = left_bound  # Pointer for left sub-array
+    right_pointer = middle + 1  # Pointer for right sub-array
+
+    # Merge the two sorted sub-arrays by comparing elements
+    while left_pointer <= middle and right_pointer <= right_bound:
+        if keys[left_pointer] <= keys[right_pointer]:  # If left element is smaller, add it
+            merged_list.append(array[left_pointer])
+            merged_keys.append(keys[left_pointer])
+            left_pointer += 1
+        else:  # If right element is smaller, add it
+            merged_list.append(array[right_pointer])
+            merged_keys.append(keys[right_pointer])
+            right_pointer += 1
+    if state is not None:
+        state.comparisons += left_pointer - left_bound + right_pointer - middle - 1  # One per element placed
+        state.moves += 2 * (right_bound - left_bound + 1)  # Into merged_list, then back into array
+
+    # Append remaining elements from the left sub-array (if any)
+    while left_pointer <= middle:
+        merged_list.append(array[left_pointer])
+        merged_keys.append(keys[left_pointer])
+        left_pointer += 1
+
+    # Append remaining elements from the right sub-array (if any)
+    while right_pointer <= right_bound:
+        merged_list.append(array[right_pointer])
+        merged_keys.append(keys[right_pointer])
+        right_pointer += 1
+
+    # Copy merged elements back into the original array at the correct positions
+    for index, sorted_value in enumerate(merged_list):
+        array[left_bound + index] = sorted_value  # Overwrite original array with sorted elements
+    if keys is not array:
+        for index, sorted_key in enumerate(merged_keys):
+            keys[left_bound + index] = sorted_key  # Keep the keys in step with the elements
+
+
+def buffered_merge(array, left_bound, middle, right_bound, keys=None, state=None):
+    """
+    Merge two sorted sub-arrays like merge(), but only the shorter run is copied, into the sort's
+    scratch buffer, and the merge writes straight back into array. When the left run is shorter it
+    is merged from the front, otherwise from the back, as in CPython's merge_lo and merge_hi.
+    :param array: The original array containing sub-arrays to merge
+    :param left_bound: Left index of the first sub-array
+    :param middle: Middle index separating the two sub-arrays
+    :param right_bound: Right index of the second sub-array
+    :param keys: Optional precomputed keys parallel to array, merged along with it
+    :param state: MergeState holding the scratch buffer
+    """
+    if middle == right_bound:
+        return  # If the two sub-arrays are already merged, return immediately
+    if keys is None:
+        keys = array  # Without precomputed keys, compare the elements themselves
+
+    left_len = middle + 1 - left_bound
+    right_len = right_bound - middle
+    if left_len <= right_len:
+        # Fill from the front; the unmerged part of the right run never moves
+        scratch_points, scratch_keys = state.copy_to_scratch(array, keys, left_bound, left_len)
+        scratch_pointer = 0  # Pointer into the copy of the left run
+        right_pointer = middle + 1  # Pointer for right sub-array
+        dest = left_bound
+        while scratch_pointer < left_len and right_pointer <= right_bound:
+            if keys[right_pointer] < scratch_keys[scratch_pointer]:  # Ties go left to keep the sort stable
+                array[dest] = array[right_pointer]
+                keys[dest] = keys[right_pointer]
+                right_pointer += 1
+            else:
+                array[dest] = scratch_points[scratch_pointer]
+                keys[dest] = scratch_keys[scratch_pointer]
+                scratch_pointer += 1
+            dest += 1
+        state.comparisons += dest - left_bound
+        state.moves += left_len + dest - left_bound + left_len - scratch_pointer
+
+        # The rest of the right run is in place; copy back the rest of the left run
+        array[dest:right_pointer] = scratch_points[scratch_pointer:left_len]
+        keys[dest:right_pointer] = scratch_keys[scratch_pointer:left_len]
+    else:
+        # Fill from the back; the unmerged part of the left run never moves
+        scratch_points, scratch_keys = state.copy_to_scratch(array, keys, middle + 1, right_len)
+        scratch_pointer = right_len - 1  # Pointer into the copy of the right run
+        left_pointer = middle  # Pointer for left sub-array
+        dest = right_bound
+        while scratch_pointer >= 0 and left_pointer >= left_bound:
+            if scratch_keys[scratch_pointer] < keys[left_pointer]:  # Ties go right to keep the sort stable
+                array[dest] = array[left_pointer]
+                keys[dest] = keys[left_pointer]
+                left_pointer -= 1
+            else:
+                array[dest] = scratch_points[scratch_pointer]
+                keys[dest] = scratch_keys[scratch_pointer]
+                scratch_pointer -= 1
+            dest -= 1
+        state.comparisons += right_bound - dest
+        state.moves += right_len + right_bound - dest + scratch_pointer + 1
+
+        # The rest of the left run is in place; copy back the rest of the right run
+        array[left_pointer + 1:dest + 1] = scratch_points[:scratch_pointer + 1]
+        keys[left_pointer + 1:dest + 1] = scratch_keys[:scratch_pointer + 1]
+
+
+def gallop_left(key, keys, start, stop, state):
+    """
+    Finds the leftmost position key can be inserted at in the sorted slice keys[start:stop].
+    Probes offsets 1, 3, 7, 15, ... from start, then binary searches the last gap.
+    :param key: Key to locate
+    :param keys: Sorted keys
+    :param start: First index of the slice
+    :param stop: One past the last index of the slice
+    :param state: MergeState counting comparisons
+    :return: First index i in [start, stop] with keys[i] >= key
+    """
+    last_offset = 0  # keys[start + last_offset - 1] < key is known to hold
+    offset = 1
+    while start + offset - 1 < stop and keys[start + offset - 1] < key:
+        state.comparisons += 1
+        last_offset = offset
+        offset = (offset << 1) + 1
+    state.comparisons += start + offset - 1 < stop  # The probe that ended the search
+
+    low = start + last_offset
+    high = min(start + offset - 1, stop)
+    while low < high:  # Binary search keys[low:high]
+        mid = (low + high) // 2
+        state.comparisons += 1
+        if keys[mid] < key:
+            low = mid + 1
+        else:
+            high = mid
+    return low
+
+
+def gallop_right(key, keys, start, stop, state):
+    """
+    Finds the rightmost position key can be inserted at in the sorted slice keys[start:stop].
+    Probes offsets 1, 3, 7, 15, ... from start, then binary searches the last gap.
+    :param key: Key to locate
+    :param keys: Sorted keys
+    :param start: First index of the slice
+    :param stop: One past the last index of the slice
+    :param state: MergeState counting comparisons
+    :return: First index i in [start, stop] with keys[i] > key
+    """
+    last_offset = 0  # keys[start + last_offset - 1] <= key is known to hold
+    offset = 1
+    while start + offset - 1 < stop and keys[start + offset - 1] <= key:
+        state.comparisons += 1
+        last_offset = offset
+        offset = (offset << 1) + 1
+    state.comparisons += start + offset - 1 < stop  # The probe that ended the search
+
+    low = start + last_offset
+    high = min(start + offset - 1, stop)
+    while low < high:  # Binary search keys[low:high]
+        mid = (low + high) // 2
+        state.comparisons += 1
+        if keys[mid] <= key:
+            low = mid + 1
+        else:
+            high = mid
+    return low
+
+
+def gallop_left_back(key, keys, start, stop, state):
+    """
+    Like gallop_left(), but probes offsets 1, 3, 7, 15, ... back from stop, for merges that fill
+    the array from the back.
+    :param key: Key to locate
+    :param keys: Sorted keys
+    :param start: First index of the slice
+    :param stop: One past the last index of the slice
+    :param state: MergeState counting comparisons
+    :return: First index i in [start, stop] with keys[i] >= key
+    """
+    last_offset = 0  # keys[stop - last_offset] >= key is known to hold
+    offset = 1
+    while stop - offset >= start and keys[stop - offset] >= key:
+        state.comparisons += 1
+        last_offset = offset
+        offset = (offset << 1) + 1
+    state.comparisons += stop - offset >= start  # The probe that ended the search
+
+    low = max(stop - offset + 1, start)
+    high = stop - last_offset
+    while low < high:  # Binary search keys[low:high]
+        mid = (low + high) // 2
+        state.comparisons += 1
+        if keys[mid] < key:
+            low = mid + 1
+        else:
+            high = mid
+    return low
+
+
+def gallop_right_back(key, keys, start, stop, state):
+    """
+    Like gallop_right(), but probes offsets 1, 3, 7, 15, ... back from stop, for merges that fill
+    the array from the back.
+    :param key: Key to locate
+    :param keys: Sorted keys
+    :param start: First index of the slice
+    :param stop: One past the last index of the slice
+    :param state: MergeState counting comparisons
+    :return: First index i in [start, stop] with keys[i] > key
+    """
+    last_offset = 0  # keys[stop - last_offset] > key is known to hold
+    offset = 1
+    while stop - offset >= start and keys[stop - offset] > key:
+        state.comparisons += 1
+        last_offset = offset
+        offset = (offset << 1) + 1
+    state.comparisons += stop - offset >= start  # The probe that ended the search
+
+    low = max(stop - offset + 1, start)
+    high = stop - last_offset
+    while low < high:  # Binary search keys[low:high]
+        mid = (low + high) // 2
+        state.comparisons += 1
+        if keys[mid] <= key:
+            low = mid + 1
+        else:
+            high = mid
+    return low
+
+
+def gallop_merge(array, left_bound, middle, right_bound, keys=None, state=None):
+    """
+    Merge two sorted sub-arrays like merge(), switching to galloping mode once one side wins
+    state.min_gallop times in a row. Galloping finds how far that side keeps winning with an
+    exponential search and moves the whole block with one slice assignment. Like buffered_merge(),
+    only the shorter run is copied to scratch: gallop_merge_lo() merges from the front when the
+    left run is shorter, gallop_merge_hi() from the back otherwise.
+    :param array: The original array containing sub-arrays to merge
+    :param left_bound: Left index of the first sub-array
+    :param middle: Middle index separating the two sub-arrays
+    :param right_bound: Right index of the second sub-array
+    :param keys: Optional precomputed keys parallel to array, merged along with it
+    :param state: MergeState carrying min_gallop between merges
+    """
+    if middle == right_bound:
+        return  # If the two sub-arrays are already merged, return immediately
+    if keys is None:
+        keys = array  # Without precomputed keys, compare the elements themselves
+
+    # Left elements not greater than the first right element, and right elements not less than
+    # the last left element, are already in place
+    left_bound = gallop_right(keys[middle + 1], keys, left_bound, middle + 1, state)
+    if left_bound > middle:
+        return
+    right_bound = gallop_left(keys[middle], keys, middle + 1, right_bound + 1, state) - 1
+
+    if middle + 1 - left_bound <= right_bound - middle:
+        gallop_merge_lo(array, left_bound, middle, right_bound, keys, state)
+    else:
+        gallop_merge_hi(array, left_bound, middle, right_bound, keys, state)
+
+
+def gallop_merge_lo(array, left_bound, middle, right_bound, keys, state):
+    """
+    Galloping merge that copies the left run to scratch and fills the array from the front.
+    Called by gallop_merge() with the runs already trimmed, so the first right element goes
+    first and the last left element goes last.
+    :param array: The original array containing sub-arrays to merge
+    :param left_bound: Left index of the first sub-array
+    :param middle: Middle index separating the two sub-arrays
+    :param right_bound: Right index of the second sub-array
+    :param keys: Keys parallel to array, merged along with it
+    :param state: MergeState carrying min_gallop between merges
+    """
+    left_len = middle + 1 - left_bound
+    # Copy of the left run; the right run stays in place
+    left_points, left_keys = state.copy_to_scratch(array, keys, left_bound, left_len)
+    left_pointer = 0  # Pointer into the copy of the left run
+    right_pointer = middle + 1  # Pointer for right sub-array
+    dest = left_bound  # Next position to fill; always right_pointer - (left_len - left_pointer)
+    min_gallop = state.min_gallop
+
+    while True:
+        left_wins = right_wins = 0
+
+        # Take one element at a time until one side keeps winning
+        while True:
+            state.comparisons += 1
+            if keys[right_pointer] < left_keys[left_pointer]:  # Ties go left to keep the sort stable
+                array[dest] = array[right_pointer]
+                keys[dest] = keys[right_pointer]
+                dest += 1
+                right_pointer += 1
+                right_wins += 1
+                left_wins = 0
+                if right_pointer > right_bound or right_wins >= min_gallop:
+                    break
+            else:
+                array[dest] = left_points[left_pointer]
+                keys[dest] = left_keys[left_pointer]
+                dest += 1
+                left_pointer += 1
+                left_wins += 1
+                right_wins = 0
+                if left_pointer == left_len or left_wins >= min_gallop:
+                    break
+        if right_pointer > right_bound or left_pointer == left_len:
+            break
+
+        # Galloping mode: move whole blocks until neither side wins a long streak
+        state.gallops += 1
+        min_gallop += 1
+        while True:
+            min_gallop -= min_gallop > 1  # Galloping is paying off; enter it sooner next time
+
+            left_block = gallop_right(keys[right_pointer], left_keys, left_pointer, left_len, state) - left_pointer
+            if left_block:
+                array[dest:dest + left_block] = left_points[left_pointer:left_pointer + left_block]
+                keys[dest:dest + left_block] = left_keys[left_pointer:left_pointer + left_block]
+                dest += left_block
+                left_pointer += left_block
+                if left_pointer == left_len:
+                    break
+            array[dest] = array[right_pointer]
+            keys[dest] = keys[right_pointer]
+            dest += 1
+            right_pointer += 1
+            if right_pointer > right_bound:
+                break
+
+            right_block = gallop_left(left_keys[left_pointer], keys, right_pointer, right_bound + 1,
+                                      state) - right_pointer
+            if right_block:
+                array[dest:dest + right_block] = array[right_pointer:right_pointer + right_block]
+                keys[dest:dest + right_block] = keys[right_pointer:right_pointer + right_block]
+                dest += right_block
+                right_pointer += right_block
+                if right_pointer > right_bound:
+                    break
+            array[dest] = left_points[left_pointer]
+            keys[dest] = left_keys[left_pointer]
+            dest += 1
+            left_pointer += 1
+            if left_pointer == left_len:
+                break
+
+            if left_block < MIN_GALLOP and right_block < MIN_GALLOP:
+                break
+        if right_pointer > right_bound or left_pointer == left_len:
+            break
+        min_gallop += 1  # Galloping stopped paying off; make it harder to re-enter
+
+    # Whatever is left of the right run is already in place; copy back the rest of the left run
+    array[dest:right_pointer] = left_points[left_pointer:left_len]
+    keys[dest:right_pointer] = left_keys[left_pointer:left_len]
+    state.min_gallop = min_gallop
+    state.moves += left_len + right_pointer - left_bound  # The scratch copy, then every position filled
+
+
+def gallop_merge_hi(array, left_bound, middle, right_bound, keys, state):
+    """
+    Galloping merge that copies the right run to scratch and fills the array from the back,
+    mirroring gallop_merge_lo().
+    :param array: The original array containing sub-arrays to merge
+    :param left_bound: Left index of the first sub-array
+    :param middle: Middle index separating the two sub-arrays
+    :param right_bound: Right index of the second sub-array
+    :param keys: Keys parallel to array, merged along with it
+    :param state: MergeState carrying min_gallop between merges
+    """
+    right_len = right_bound - middle
+    # Copy of the right run; the left run stays in place
+    right_points, right_keys = state.copy_to_scratch(array, keys, middle + 1, right_len)
+    right_pointer = right_len - 1  # Pointer into the copy of the right run
+    left_pointer = middle  # Pointer for left sub-array
+    dest = right_bound  # Next position to fill; always left_pointer + right_pointer + 1
+    min_gallop = state.min_gallop
+
+    while True:
+        left_wins = right_wins = 0
+
+        # Take one element at a time until one side keeps winning
+        while True:
+            state.comparisons += 1
+            if right_keys[right_pointer] < keys[left_pointer]:  # Ties go right to keep the sort stable
+                array[dest] = array[left_pointer]
+                keys[dest] = keys[left_pointer]
+                dest -= 1
+                left_pointer -= 1
+                left_wins += 1
+                right_wins = 0
+                if left_pointer < left_bound or left_wins >= min_gallop:
+                    break
+            else:
+                array[dest] = right_points[right_pointer]
+                keys[dest] = right_keys[right_pointer]
+                dest -= 1
+                right_pointer -= 1
+                right_wins += 1
+                left_wins = 0
+                if right_pointer < 0 or right_wins >= min_gallop:
+                    break
+        if left_pointer < left_bound or right_pointer < 0:
+            break
+
+        # Galloping mode: move whole blocks until neither side wins a long streak
+        state.gallops += 1
+        min_gallop += 1
+        while True:
+            min_gallop -= min_gallop > 1  # Galloping is paying off; enter it sooner next time
+
+            left_block = left_pointer + 1 - gallop_right_back(right_keys[right_pointer], keys, left_bound,
+                                                              left_pointer + 1, state)
+            if left_block:
+                array[dest - left_block + 1:dest + 1] = array[left_pointer - left_block + 1:left_pointer + 1]
+                keys[dest - left_block + 1:dest + 1] = keys[left_pointer - left_block + 1:left_pointer + 1]
+                dest -= left_block
+                left_pointer -= left_block
+                if left_pointer < left_bound:
+                    break
+            array[dest] = right_points[right_pointer]
+            keys[dest] = right_keys[right_pointer]
+            dest -= 1
+            right_pointer -= 1
+            if right_pointer < 0:
+                break
+
+            right_block = right_pointer + 1 - gallop_left_back(keys[left_pointer], right_keys, 0,
+                                                               right_pointer + 1, state)
+            if right_block:
+                block_start = right_pointer - right_block + 1
+                array[dest - right_block + 1:dest + 1] = right_points[block_start:right_pointer + 1]
+                keys[dest - right_block + 1:dest + 1] = right_keys[block_start:right_pointer + 1]
+                dest -= right_block
+                right_pointer -= right_block
+                if right_pointer < 0:
+                    break
+            array[dest] = array[left_pointer]
+            keys[dest] = keys[left_pointer]
+            dest -= 1
+            left_pointer -= 1
+            if left_pointer < left_bound:
+                break
+
+            if left_block < MIN_GALLOP and right_block < MIN_GALLOP:
+                break
+        if left_pointer < left_bound or right_pointer < 0:
+            break
+        min_gallop += 1  # Galloping stopped paying off; make it harder to re-enter
+
+    # Whatever is left of the left run is already in place; copy back the rest of the right run
+    array[left_pointer + 1:dest + 1] = right_points[:right_pointer + 1]
+    keys[left_pointer + 1:dest + 1] = right_keys[:right_pointer + 1]
+    state.min_gallop = min_gallop
+    state.moves += right_len + right_bound - left_pointer  # The scratch copy, then every position filled
+
+
+def insertion_sort(points, left, right, keys=None, state=None):
+    """
+    Sorts a sub-array using insertion sort.
+    :param points: List of Point objects
+    :param left: Left index of the sub-array
+    :param right: Right index of the sub-array
+    :param keys: Optional precomputed keys parallel to points, sorted along with them
+    :param state: Optional MergeState counting comparisons
+    """
+    if keys is None:
+        keys = points  # Without precomputed keys, compare the points themselves
+
+    for index in range(left + 1, right + 1):
+        current_value = points[index]
+        current_key = keys[index]
+        j = index - 1
+        while j >= left and keys[j] > current_key:
+            points[j + 1] = points[j]
+            keys[j + 1] = keys[j]
+            j -= 1
+        points[j + 1] = current_value
+        keys[j + 1] = current_key
+        if state is not None:
+            state.comparisons += index - j - (j < left)  # One per shift, plus the one that stopped it
+            state.shifts += index - 1 - j
+
+
+def stream_timsort(input_stream, gallop=False, descending_runs=False, buffered=True, trace=NO_TRACE,
+                   metrics=NO_METRICS):
+    """
+    Sorts points by angle while they are still being read. A reader thread reads and parses the
+    input block by block; each block's angles are computed as it arrives, and timsort() detects
+    and merges runs as soon as their points are in. Only the final merges wait for the end of the
+    input. The runs, the merges and therefore the trace are the same as for the whole input.
+    :param input_stream: Binary stream the points are read from, e.g. sys.stdin.buffer
+    :param gallop: Passed to timsort()
+    :param descending_runs: Passed to timsort()
+    :param buffered: Passed to timsort()
+    :param trace: TimsortTrace the runs and merges are logged to
+    :param metrics: Metrics the counters of the sort are added to
+    :return: (PointSet of all points, list of the point indices in sorted order)
+    """
+    points = point_set.PointSet(array("d"), array("d"), Point)
+    order = []
+    keys = []
+    blocks = read_ahead(iter_points(input_stream, STREAM_BLOCK_BYTES), STREAM_BLOCKS_AHEAD)
+
+    def read_more():
+        """
+        Appends the next block of points and their keys.
+        :return: False once the input has ended
+        """
+        block = next(blocks, None)
+        if block is None:
+            return False
+        block = point_set.PointSet(*block)
+        order.extend(range(len(order), len(order) + len(block)))
+        keys.extend(compute_keys(block, metrics))
+        points.xs.extend(block.xs)
+        points.ys.extend(block.ys)
+        return True
+
+    try:
+        timsort(order, keys, gallop, False, descending_runs, buffered, trace, metrics, read_more)
+    finally:
+        blocks.close()  # Stops the reader thread if the sort failed before the end of the input
+    return points, order
+
+
+def sort_points(xs, ys, engine="python", workers=1, gallop=False, adaptive_min_run=False, descending_runs=False,
+                buffered=True, trace=NO_TRACE, metrics=NO_METRICS):
+    """
+    Sorts points by angle; the library entry point behind angular-sort.py.
+    :param xs: x-coordinates, as array('d'), a NumPy array or any sequence of floats
+    :param ys: y-coordinates, parallel to xs
+    :param engine: "python" runs timsort(), "numpy" a vectorized stable argsort (requires NumPy)
+    :param workers: Number of processes the python engine sorts with (see parallel_timsort())
+    :param gallop: Passed to timsort()
+    :param adaptive_min_run: Passed to timsort()
+    :param descending_runs: Passed to timsort()
+    :param buffered: Passed to timsort()
+    :param trace: TimsortTrace the runs and merges are logged to
+    :param metrics: Metrics the counters and phase timings of the sort are added to
+    :return: List of the point indices in sorted order
+    """
+    points = point_set.PointSet(xs, ys, Point)
+    if engine == "numpy":
+        return numpy_timsort(points, trace, metrics)
+    if workers > 1:
+        with metrics.phase("sort"):
+            return parallel_timsort(points, workers, gallop, adaptive_min_run, descending_runs, buffered, trace,
+                                    metrics)
+
+    with metrics.phase("keys"):
+        keys = compute_keys(points, metrics)  # one angle per point instead of several per comparison
+    order = list(range(len(points)))
+    with metrics.phase("sort"):
+        timsort(order, keys, gallop, adaptive_min_run, descending_runs, buffered, trace, metrics)
+    if metrics.enabled:  # What the sort did outside merges: run detection and insertion sort
+        metrics.add_time("scan", metrics.timings["sort"] - metrics.timings.get("merge", 0))
+    return order
+
+
+def parse_args():
+    """
+    Parses the command line arguments.
+    :return: argparse.Namespace with info_file, engine, workers, output_format, memory_limit, cache, cache_size,
+             metrics and profile
+    """
+    parser = argparse.ArgumentParser(description="Sorts points read from standard input by angle using TimSort.")
+    parser.add_argument("info_file", nargs="?", help="file the TimSort information is written to")
+    parser.add_argument("--trace", choices=TRACE_LEVELS, default="full",
+                        help="full writes every run and merge, summary only the totals, off no information file")
+    parser.add_argument("--trace-thread", action="store_true",
+                        help="write the information file from a background thread")
+    parser.add_argument("--engine", choices=("python", "numpy"), default="python",
+                        help="python runs timsort() on Point objects (reference), "
+                             "numpy sorts precomputed angles with a stable argsort")
+    parser.add_argument("--merge", choices=("buffer", "list"), default="buffer",
+                        help="buffer merges through one scratch buffer reused for the whole sort, "
+                             "list builds a new merged list for every merge")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="write the peak memory allocated while sorting to standard error")
+    parser.add_argument("--gallop", action="store_true",
+                        help="merge with galloping mode and an adaptive min-gallop threshold")
+    parser.add_argument("--adaptive-minrun", action="store_true",
+                        help="compute the minimum run length from the number of points")
+    parser.add_argument("--descending-runs", action="store_true",
+                        help="detect strictly descending runs and reverse them in place")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="sort chunks of the points in this many processes and k-way merge them (default 1)")
+    parser.add_argument("--output-format", choices=("text", "binary"), default="text",
+                        help="text writes one point per line, binary a binary point file (see point_file.py)")
+    parser.add_argument("--memory-limit", type=parse_memory_limit,
+                        help="sort out of core within about this much memory, e.g. 256M, spilling sorted "
+                             "chunks to temporary files")
+    parser.add_argument("--stream", action="store_true",
+                        help="sort the points while they are still being read, e.g. from a pipe")
+    parser.add_argument("--cache", metavar="DIR",
+                        help="reuse the output and information file of an earlier run on the same input with the "
+                             "same options, kept in the cache directory DIR (see result_cache.py)")
+    parser.add_argument("--cache-size", type=parse_memory_limit, default=DEFAULT_CACHE_SIZE,
+                        help=f"evict the least recently used results beyond this size (default {DEFAULT_CACHE_SIZE})")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write the sort's counters and phase timings as JSON to FILE, or to standard error "
+                             "if FILE is -")
+    parser.add_argument("--profile", choices=PROFILERS,
+                        help="run under cProfile or tracemalloc and write the report to standard error")
+    args = parser.parse_args()
+    if args.info_file is None and args.trace != "off":
+        parser.error("the info_file argument is required unless --trace=off")
+    if args.engine == "numpy" and np is None:
+        parser.error("--engine=numpy requires NumPy")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.workers > 1 and args.memory_report:
+        parser.error("--memory-report only measures a single-process sort")
+    if args.memory_limit is not None and (args.engine == "numpy" or args.workers > 1 or args.memory_report):
+        parser.error("--memory-limit cannot be combined with --engine=numpy, --workers or --memory-report")
+    if args.engine == "numpy" and (args.gallop or args.adaptive_minrun or args.descending_runs or args.workers > 1):
+        parser.error("--gallop, --adaptive-minrun, --descending-runs and --workers require --engine=python")
+    if args.stream and (args.engine == "numpy" or args.workers > 1 or args.memory_limit is not None
+                        or args.memory_report or args.adaptive_minrun):
+        parser.error("--stream cannot be combined with --engine=numpy, --workers, --memory-limit, --memory-report "
+                     "or --adaptive-minrun")
+    if args.profile == "tracemalloc" and args.memory_report:
+        parser.error("--profile=tracemalloc cannot be combined with --memory-report")
+    if args.cache is not None and (args.stream or args.memory_report):
+        parser.error("--cache cannot be combined with --stream or --memory-report")
+    return args
+
+
+def main():
+    args = parse_args()
+    if args.metrics is not None or args.memory_report:
+        metrics = Metrics(phase_memory=args.memory_report)
+    else:
+        metrics = NO_METRICS
+    sort = partial(sort_input, args, metrics)
+    if args.cache is not None:
+        try:
+            cache = ResultCache(args.cache, args.cache_size, metrics)
+        except OSError as error:
+            sys.exit(f"angular-sort.py: {error}")
+        sort = partial(cache.run, "angular-sort.py", {name: getattr(args, name) for name in CACHED_OPTIONS},
+                       sys.stdin.buffer, args.info_file if args.trace != "off" else None, sort)
+    else:
+        sort = partial(sort, sys.stdin.buffer)
+    run_profiled(args.profile, sort)
+    if args.metrics is not None:
+        metrics.write("angular-sort.py", args.metrics)
+
+
+def sort_input(args, metrics, input_stream):
+    """
+    Sorts the points of the input and writes them to standard output.
+    :param args: argparse.Namespace from parse_args()
+    :param metrics: Metrics the counters and phase timings of the run are added to
+    :param input_stream: Binary stream the points are read from, e.g. sys.stdin.buffer
+    """
+    trace = TimsortTrace(args.info_file, args.trace, args.trace_thread)
+
+    if args.memory_limit is not None:
+        try:
+            with metrics.phase("sort"):
+                count, blocks = external_timsort(input_stream, args.memory_limit, args.gallop,
+                                                 args.adaptive_minrun, args.descending_runs, args.merge == "buffer",
+                                                 trace, metrics)
+        except ValueError as error:
+            sys.exit(f"angular-sort.py: {error}")
+        trace.close()
+        with metrics.phase("output"):  # Includes the final merge, which runs as the blocks are written
+            if args.output_format == "binary":
+                write_point_blocks(sys.stdout.buffer, count, blocks)
+            else:
+                for xs, ys in blocks:
+                    write_points(sys.stdout, point_set.PointSet(xs, ys), range(len(xs)))
+        return
+
+    if args.stream:
+        try:
+            with metrics.phase("sort"):  # Includes reading and parsing, which overlap with the sort
+                points, order = stream_timsort(input_stream, args.gallop, args.descending_runs,
+                                               args.merge == "buffer", trace, metrics)
+        except ValueError as error:
+            sys.exit(f"angular-sort.py: {error}")
+        trace.close()
+        write_sorted_points(args, points, order, metrics)
+        return
+
+    try:
+        with metrics.phase("parse"):
+            xs, ys = load_points(input_stream)
+    except ValueError as error:
+        sys.exit(f"angular-sort.py: {error}")
+    # Stores the points as two coordinate arrays and sorts their indices
+    points = point_set.PointSet(xs, ys, Point)
+
+    if args.memory_report:
+        tracemalloc.start()  # The sort phase records what it allocates on top of the points and keys
+    order = sort_points(points.xs, points.ys, args.engine, args.workers, args.gallop, args.adaptive_minrun,
+                        args.descending_runs, args.merge == "buffer", trace, metrics)
+    if args.memory_report:
+        tracemalloc.stop()
+        print(f"peak memory allocated while sorting = {metrics.counters['sort_peak_bytes']} bytes", file=sys.stderr)
+    trace.close()
+    write_sorted_points(args, points, order, metrics)
+
+
+def write_sorted_points(args, points, order, metrics):
+    """
+    Writes the sorted points to standard output in the format asked for.
+    :param args: argparse.Namespace from parse_args()
+    :param points: PointSet
+    :param order: Indices of the points in sorted order
+    :param metrics: Metrics the output phase is timed in
+    """
+    with metrics.phase("output"):
+        if args.output_format == "binary":
+            write_point_file(sys.stdout.buffer, points, order)
+        else:
+            write_points(sys.stdout, points, order)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import angular_sort
+from closest import closest_distance
+from point_loader import load_points
+from point_file import write_point_file
+from point_writer import write_points
+from point_set import PointSet
+
+PROGRAMS = ("angular-sort", "closest")
+
+
+def read_manifest(path, program):
+    """
+    Reads a batch manifest: one job per line, "input output" or, for angular-sort, "input output trace",
+    where trace is the job's TimSort information file. Blank lines and lines starting with # are skipped.
+    :param path: Manifest file, or "-" for standard input
+    :param program: "angular-sort" or "closest"
+    :return: List of (input path, output path, trace path or None) tuples
+    """
+    manifest = sys.stdin if path == "-" else open(path)
+    with manifest:
+        jobs = []
+        for line_number, line in enumerate(manifest, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            if len(fields) not in ((2, 3) if program == "angular-sort" else (2,)):
+                raise ValueError(f"{path}, line {line_number}: expected "
+                                 + ("input, output and optionally trace paths" if program == "angular-sort"
+                                    else "input and output paths"))
+            jobs.append((fields[0], fields[1], fields[2] if len(fields) == 3 else None))
+    return jobs
+
+
+def sort_job(job, options):
+    """
+    Runs angular-sort.py on one input file.
+    :param job: (input path, output path, trace path or None)
+    :param options: argparse.Namespace with engine, merge, gallop, adaptive_minrun, descending_runs, trace
+                    and output_format
+    """
+    input_path, output_path, trace_path = job
+    with open(input_path, "rb") as input_file:
+        xs, ys = load_points(input_file)
+    points = PointSet(xs, ys)
+    trace = angular_sort.TimsortTrace(trace_path, options.trace if trace_path else "off")
+    try:
+        order = angular_sort.sort_points(points.xs, points.ys, options.engine, 1, options.gallop,
+                                         options.adaptive_minrun, options.descending_runs,
+                                         options.merge == "buffer", trace)
+    finally:
+        trace.close()
+    if options.output_format == "binary":
+        with open(output_path, "wb") as output_file:
+            write_point_file(output_file, points, order)
+    else:
+        with open(output_path, "w") as output_file:
+            write_points(output_file, points, order)
+
+
+def closest_job(job, options):
+    """
+    Runs closest.py on one input file.
+    :param job: (input path, output path, None)
+    :param options: argparse.Namespace with algorithm
+    """
+    input_path, output_path, _ = job
+    with open(input_path, "rb") as input_file:
+        xs, ys = load_points(input_file)
+    distance = closest_distance(xs, ys, options.algorithm)
+    with open(output_path, "w") as output_file:
+        print("The closest pair of points is", distance, file=output_file)
+
+
+def run_job(job, options):
+    """
+    Runs one job of the manifest, turning its errors into a message so the other jobs carry on.
+    :param job: (input path, output path, trace path or None)
+    :param options: argparse.Namespace from parse_args()
+    :return: None on success, else the error message
+    """
+    try:
+        (sort_job if options.program == "angular-sort" else closest_job)(job, options)
+    except (OSError, ValueError) as error:
+        return f"batch.py: {job[0]}: {error}"
+    return None
+
+
+def parse_args():
+    """
+    Parses the command line arguments.
+    :return: argparse.Namespace with program, manifest, jobs and the options of the program
+    """
+    parser = argparse.ArgumentParser(description="Runs angular-sort.py or closest.py on every input file of a "
+                                                 "manifest in one process, or in a pool of worker processes.")
+    parser.add_argument("program", choices=PROGRAMS, help="program to run on every input file")
+    parser.add_argument("manifest", help='file listing one "input output [trace]" job per line, or - for '
+                                         "standard input")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="number of worker processes the jobs are spread across (default 1, in this process)")
+    parser.add_argument("--engine", choices=("python", "numpy"), default="python", help="as for angular-sort.py")
+    parser.add_argument("--merge", choices=("buffer", "list"), default="buffer", help="as for angular-sort.py")
+    parser.add_argument("--gallop", action="store_true", help="as for angular-sort.py")
+    parser.add_argument("--adaptive-minrun", action="store_true", help="as for angular-sort.py")
+    parser.add_argument("--descending-runs", action="store_true", help="as for angular-sort.py")
+    parser.add_argument("--trace", choices=("full", "summary"), default="full",
+                        help="level of the information files of the jobs that name one (default full)")
+    parser.add_argument("--output-format", choices=("text", "binary"), default="text", help="as for angular-sort.py")
+    parser.add_argument("--algorithm", choices=("sweep", "grid", "numpy"), default="sweep", help="as for closest.py")
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if (args.engine == "numpy" or args.algorithm == "numpy") and angular_sort.np is None:
+        parser.error("--engine=numpy and --algorithm=numpy require NumPy")
+    if args.engine == "numpy" and (args.gallop or args.adaptive_minrun or args.descending_runs):
+        parser.error("--gallop, --adaptive-minrun and --descending-runs require --engine=python")
+    return args
+
+
+def main():
+    args = parse_args()
+    try:
+        jobs = read_manifest(args.manifest, args.program)
+    except (OSError, ValueError) as error:
+        sys.exit(f"batch.py: {error}")
+
+    if args.jobs > 1:
+        with ProcessPoolExecutor(args.jobs) as executor:
+            # Jobs are handed out in batches, so small inputs do not cost one round trip each
+            errors = list(executor.map(run_job, jobs, [args] * len(jobs),
+                                       chunksize=max(1, len(jobs) // (4 * args.jobs))))
+    else:
+        errors = [run_job(job, args) for job in jobs]
+
+    errors = [error for error in errors if error is not None]
+    for error in errors:
+        print(error, file=sys.stderr)
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,457 @@
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+import importlib.util
+
+from closest import closest_distance
+from point_set import Point, PointSet
+from point_loader import load_points
+from point_file import write_point_file
+
+# Benchmarks run the scripts exactly as the README does, one process per measurement
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ANGULAR_SORT = os.path.join(SCRIPT_DIR, "angular-sort.py")
+CLOSEST = os.path.join(SCRIPT_DIR, "closest.py")
+SEED = 2025  # Seed of the generated point sets
+CLOSEST_ALGORITHMS = ("sweep", "grid", "numpy")  # closest.py --algorithm choices, in table order
+SUITE_DISTRIBUTIONS = ("uniform", "clustered", "diagonal", "identical-angles", "angle-sorted", "reverse-sorted",
+                       "duplicates")
+SUITE_ENGINES = (  # (program, engine name, command line arguments, needs NumPy)
+    ("angular-sort", "python", ["--engine=python"], False),
+    ("angular-sort", "numpy", ["--engine=numpy"], True),
+    ("closest", "sweep", ["--algorithm=sweep"], False),
+    ("closest", "grid", ["--algorithm=grid"], False),
+    ("closest", "numpy", ["--algorithm=numpy"], True),
+)
+READ_CHUNK_BYTES = 1 << 20  # Bytes of a script's output hashed at a time
+SUITE_MIN_TIME_REGRESSION = 0.05  # Seconds a run must slow down by to count as a regression
+STREAM_CHECK_POINTS = 1000  # Points per distribution whose closest.py --stream updates the suite checks
+# Points whose closest distance drops to 0 and is followed by more points, some of them close
+STREAM_DUPLICATE_POINTS = ([0, 5, 5, 10, 20, 1], [0, 5, 5, 10, 20, 1])
+
+
+def write_uniform_points(path, size, seed=SEED):
+    """
+    Writes size points drawn uniformly from [-1000, 1000) x [-1000, 1000), one per line.
+    :param path: File to write
+    :param size: Number of points
+    :param seed: Random seed
+    """
+    generator = random.Random(seed)
+    with open(path, "w") as point_file:
+        for _ in range(size):
+            point_file.write(f"{generator.uniform(-1000, 1000)} {generator.uniform(-1000, 1000)}\n")
+
+
+def timed_run(script, arguments, input_path, repeat=1):
+    """
+    Runs one of the scripts and measures its wall time.
+    :param script: Path of the script to run
+    :param arguments: Command line arguments for the script
+    :param input_path: File redirected to the script's standard input
+    :param repeat: Number of runs; the fastest one counts
+    :return: Wall time in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run_script(script, arguments, input_path)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run_script(script, arguments, input_path):
+    """
+    Runs one of the scripts with input_path as its standard input.
+    :param script: Path of the script to run
+    :param arguments: Command line arguments for the script
+    :param input_path: File redirected to the script's standard input
+    :return: The script's standard error
+    """
+    with open(input_path, "rb") as input_file:
+        result = subprocess.run([sys.executable, script, *arguments], stdin=input_file,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    return result.stderr
+
+
+def merge_memory(args):
+    """
+    Prints the peak memory angular-sort.py allocates while sorting, for each merge path.
+    :param args: argparse.Namespace with input
+    """
+    print(f"{'merge path':<12}{'peak memory (bytes)':>20}")
+    for merge_path in ("list", "buffer"):
+        report = run_script(ANGULAR_SORT, [f"--merge={merge_path}", "--memory-report", os.devnull], args.input)
+        peak = re.search(r"peak memory allocated while sorting = (\d+) bytes", report).group(1)
+        print(f"{merge_path:<12}{peak:>20}")
+
+
+class DictPoint:
+
+    def __init__(self, x, y):
+        """
+        A point laid out like the original Point class, with a per-instance __dict__.
+        :param x: x-coordinate
+        :param y: y-coordinate
+        """
+        self.x = x
+        self.y = y
+
+
+def traced_bytes(build):
+    """
+    Measures the memory held by the object build() returns.
+    :param build: Function building the object to measure
+    :return: Bytes allocated by build() that are still in use when it returns
+    """
+    tracemalloc.start()
+    built = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del built
+    return size
+
+
+def point_memory(args):
+    """
+    Prints the memory one point takes as a Python object and inside a PointSet.
+    :param args: argparse.Namespace with input
+    """
+    with open(args.input, "rb") as input_file:
+        xs, ys = load_points(input_file)
+    coordinates = PointSet(xs, ys)  # Iterating its array('d') buffers boxes every float afresh
+    xs, ys = coordinates.xs, coordinates.ys
+    layouts = (
+        ("Point objects with __dict__", lambda: [DictPoint(x, y) for x, y in zip(xs, ys)]),
+        ("slotted Point objects", lambda: [Point(x, y) for x, y in zip(xs, ys)]),
+        ("PointSet", lambda: PointSet(xs.tolist(), ys.tolist())),
+    )
+    print(f"{'storage':<30}{'bytes':>14}{'bytes per point':>18}")
+    for name, build in layouts:
+        size = traced_bytes(build)
+        print(f"{name:<30}{size:>14}{size / len(xs):>18.1f}")
+
+
+def closest_crossover(args):
+    """
+    Times closest.py with each --algorithm on uniform point sets of growing size and prints the
+    size from which on the grid is faster than the sweep.
+    :param args: argparse.Namespace with sizes and repeat
+    """
+    print(f"{'points':>10}" + "".join(f"{algorithm + ' (s)':>12}" for algorithm in CLOSEST_ALGORITHMS))
+    crossover = None
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sorted(args.sizes):
+            input_path = os.path.join(directory, f"uniform-{size}.txt")
+            write_uniform_points(input_path, size)
+            times = {algorithm: timed_run(CLOSEST, [f"--algorithm={algorithm}"], input_path, args.repeat)
+                     for algorithm in CLOSEST_ALGORITHMS}
+            print(f"{size:>10}" + "".join(f"{times[algorithm]:>12.3f}" for algorithm in CLOSEST_ALGORITHMS))
+            if times["grid"] >= times["sweep"]:
+                crossover = None
+            elif crossover is None:
+                crossover = size
+    if crossover is None:
+        print("the grid did not overtake the sweep at these sizes")
+    else:
+        print(f"the grid is faster than the sweep from {crossover} points on")
+
+
+def default_worker_counts():
+    """
+    :return: 1, 2, 4, ... up to the number of cores, and the number of cores itself
+    """
+    cores = os.cpu_count() or 1
+    return sorted({1 << power for power in range(cores.bit_length()) if 1 << power <= cores} | {cores})
+
+
+def closest_scaling(args):
+    """
+    Times closest.py --workers on one uniform point set for a growing number of workers and prints
+    the speedup over a single worker.
+    :param args: argparse.Namespace with size, workers and repeat
+    """
+    print(f"{'workers':>10}{'time (s)':>12}{'speedup':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, f"uniform-{args.size}.txt")
+        write_uniform_points(input_path, args.size)
+        single_time = None
+        for workers in sorted(set(args.workers) | {1}):
+            run_time = timed_run(CLOSEST, [f"--workers={workers}"], input_path, args.repeat)
+            single_time = single_time or run_time
+            print(f"{workers:>10}{run_time:>12.3f}{single_time / run_time:>10.2f}")
+
+
+def distribution_points(name, size, seed=SEED):
+    """
+    Generates one of the benchmark suite's point distributions. None of them holds the origin,
+    which has no angle.
+    :param name: One of SUITE_DISTRIBUTIONS
+    :param size: Number of points
+    :param seed: Random seed
+    :return: (xs, ys) lists of coordinates
+    """
+    generator = random.Random(seed)
+    uniform = generator.uniform
+    if name == "uniform":
+        points = [(uniform(-1000, 1000), uniform(-1000, 1000)) for _ in range(size)]
+    elif name == "clustered":  # Dense Gaussian clusters, about 1,000 points each
+        centres = [(uniform(-1000, 1000), uniform(-1000, 1000)) for _ in range(max(1, size // 1000))]
+        points = [(x + generator.gauss(0, 1), y + generator.gauss(0, 1))
+                  for x, y in (generator.choice(centres) for _ in range(size))]
+    elif name == "diagonal":  # Collinear points whose y rises with x: the sweep tree's insertion worst case
+        points = [(x, 2 * x + 1) for x in (uniform(-1000, 1000) for _ in range(size))]
+    elif name == "identical-angles":  # Points on the axes and the diagonal share five exact angles
+        rays = ((1, 0), (0, 1), (-1, 0), (0, -1), (1, 1))
+        points = [(dx * radius, dy * radius)
+                  for (dx, dy), radius in ((generator.choice(rays), uniform(1, 1000)) for _ in range(size))]
+    elif name in ("angle-sorted", "reverse-sorted"):
+        angles = [2 * math.pi * (index + 0.5) / size for index in range(size)]
+        if name == "reverse-sorted":
+            angles.reverse()
+        points = [(radius * math.cos(angle), radius * math.sin(angle))
+                  for angle, radius in ((angle, uniform(1, 1000)) for angle in angles)]
+    elif name == "duplicates":  # Every point repeats about 100 times
+        pool = [(uniform(-1000, 1000), uniform(-1000, 1000)) for _ in range(max(1, size // 100))]
+        points = [generator.choice(pool) for _ in range(size)]
+    else:
+        raise ValueError(f"unknown distribution {name}")
+    return [x for x, _ in points], [y for _, y in points]
+
+
+def measure_run(script, arguments, input_path):
+    """
+    Runs one of the scripts once and measures it.
+    :param script: Path of the script to run
+    :param arguments: Command line arguments for the script
+    :param input_path: File redirected to the script's standard input
+    :return: (wall time in seconds, peak resident memory in KiB, SHA-256 hex digest of the standard output)
+    """
+    checksum = hashlib.sha256()
+    with open(input_path, "rb") as input_file:
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, script, *arguments], stdin=input_file,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        while chunk := process.stdout.read(READ_CHUNK_BYTES):
+            checksum.update(chunk)
+        errors = process.stderr.read()
+        _, status, usage = os.wait4(process.pid, 0)  # Unlike Popen.wait(), also returns the child's peak RSS
+        seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, process.args, stderr=errors)
+    return seconds, usage.ru_maxrss, checksum.hexdigest()
+
+
+def read_counters(script, arguments, input_path, metrics_path):
+    """
+    Runs one of the scripts once more with --metrics to collect its counters. The run is not timed:
+    counting tree operations slows the closest.py sweep down.
+    :param script: Path of the script to run
+    :param arguments: Command line arguments for the script
+    :param input_path: File redirected to the script's standard input
+    :param metrics_path: Temporary file for the metrics
+    :return: Dictionary of the counters, e.g. {"comparisons": 1025842}
+    """
+    measure_run(script, [*arguments, "--metrics", metrics_path], input_path)
+    with open(metrics_path) as metrics_file:
+        return json.load(metrics_file)["counters"]
+
+
+def suite(args):
+    """
+    Runs every engine of both scripts on every distribution and size, prints the measurements,
+    writes them to a JSON file and compares them to a stored baseline.
+    :param args: argparse.Namespace with sizes, distributions, programs, repeat, output, baseline and tolerance
+    """
+    have_numpy = importlib.util.find_spec("numpy") is not None
+    engines = [(program, engine, arguments) for program, engine, arguments, needs_numpy in SUITE_ENGINES
+               if program in args.programs and (have_numpy or not needs_numpy)]
+    results = []
+    print(f"{'program':<14}{'engine':<8}{'distribution':<18}{'points':>10}{'time (s)':>10}{'RSS (MiB)':>11}"
+          f"{'comparisons':>13}  checksum")
+    with tempfile.TemporaryDirectory() as directory:
+        metrics_path = os.path.join(directory, "metrics.json")
+        for size in sorted(args.sizes):
+            for distribution in args.distributions:
+                input_path = os.path.join(directory, f"{distribution}-{size}.bin")
+                xs, ys = distribution_points(distribution, size)
+                with open(input_path, "wb") as input_file:
+                    write_point_file(input_file, PointSet(xs, ys), range(size))
+                del xs, ys
+
+                for program, engine, arguments in engines:
+                    script = ANGULAR_SORT if program == "angular-sort" else CLOSEST
+                    if program == "angular-sort":
+                        arguments = [*arguments, "--trace=off"]
+                    runs = [measure_run(script, arguments, input_path) for _ in range(args.repeat)]
+                    result = {
+                        "program": program, "engine": engine, "distribution": distribution, "size": size,
+                        "seconds": min(seconds for seconds, _, _ in runs),
+                        "peak_rss_kib": max(rss for _, rss, _ in runs),
+                        "checksum": runs[0][2],
+                        "counters": read_counters(script, arguments, input_path, metrics_path),
+                    }
+                    results.append(result)
+                    comparisons = result["counters"].get("comparisons", "-")
+                    print(f"{program:<14}{engine:<8}{distribution:<18}{size:>10}{result['seconds']:>10.3f}"
+                          f"{result['peak_rss_kib'] / 1024:>11.1f}{comparisons:>13}  {result['checksum'][:12]}")
+                os.remove(input_path)
+
+    problems = check_engines_agree(results)
+    if "closest" in args.programs:
+        problems += check_stream_updates("duplicate then more", *STREAM_DUPLICATE_POINTS)
+        for distribution in args.distributions:
+            problems += check_stream_updates(distribution, *distribution_points(distribution, STREAM_CHECK_POINTS))
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({"python": sys.version.split()[0], "seed": SEED, "results": results}, output_file, indent=1)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            problems += find_regressions(results, json.load(baseline_file)["results"], args.tolerance)
+    for problem in problems:
+        print(problem)
+    if problems:
+        sys.exit(1)
+
+
+def suite_key(result):
+    """
+    :param result: One measurement of suite()
+    :return: What the measurement is of: (program, engine, distribution, size)
+    """
+    return result["program"], result["engine"], result["distribution"], result["size"]
+
+
+def check_engines_agree(results):
+    """
+    :param results: Measurements of suite()
+    :return: One message per input on which the engines of a program wrote different output
+    """
+    checksums = {}
+    for result in results:
+        checksums.setdefault((result["program"], result["distribution"], result["size"]), {})[result["engine"]] = \
+            result["checksum"]
+    return [f"MISMATCH {program} {distribution} {size}: engines disagree ({', '.join(sorted(engines))})"
+            for (program, distribution, size), engines in checksums.items() if len(set(engines.values())) > 1]
+
+
+def check_stream_updates(name, xs, ys):
+    """
+    Runs closest.py --stream on points and checks its updates against batch runs: every printed
+    distance must be the one of the prefix it was printed after, and the distance must not change
+    between two updates or after the last one.
+    :param name: Name of the point set, for the messages
+    :param xs: x-coordinates
+    :param ys: y-coordinates, parallel to xs
+    :return: One message per wrong or missing update
+    """
+    lines = "".join(f"{x!r} {y!r}\n" for x, y in zip(xs, ys))
+    result = subprocess.run([sys.executable, CLOSEST, "--stream"], input=lines, capture_output=True, text=True,
+                            check=True)
+    updates = [(int(count), float(distance)) for count, distance in
+               re.findall(r"^after (\d+) points: The closest pair of points is (\S+)$", result.stdout, re.MULTILINE)]
+    problems = []
+    previous = float("inf")
+    for count, distance in updates + [(len(xs) + 1, None)]:
+        # Just before an update, and after the last one, the distance is still the previous update's
+        unchanged = closest_distance(xs[:count - 1], ys[:count - 1])
+        if unchanged != previous:
+            problems.append(f"STREAM {name}: after {count - 1} points the distance is {unchanged}, "
+                            f"but --stream last printed {previous}")
+        if distance is not None and closest_distance(xs[:count], ys[:count]) != distance:
+            problems.append(f"STREAM {name}: after {count} points --stream printed {distance}, "
+                            f"but a batch run gives {closest_distance(xs[:count], ys[:count])}")
+        previous = distance
+    return problems
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    Compares measurements with a baseline from an earlier suite() run. Times and peak memory
+    regress when they grow by more than tolerance; output checksums and counters, e.g. comparisons,
+    must not change at all.
+    :param results: Measurements of suite()
+    :param baseline: Measurements of the baseline run
+    :param tolerance: Allowed relative growth, e.g. 0.25 for 25%
+    :return: One message per regression
+    """
+    baseline = {suite_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        base = baseline.get(suite_key(result))
+        if base is None:
+            continue
+        name = " ".join(map(str, suite_key(result)))
+        if (result["seconds"] > base["seconds"] * (1 + tolerance)
+                and result["seconds"] - base["seconds"] > SUITE_MIN_TIME_REGRESSION):
+            regressions.append(f"REGRESSION {name}: time {base['seconds']:.3f} s -> {result['seconds']:.3f} s")
+        if result["peak_rss_kib"] > base["peak_rss_kib"] * (1 + tolerance):
+            regressions.append(f"REGRESSION {name}: peak RSS {base['peak_rss_kib']} KiB -> "
+                               f"{result['peak_rss_kib']} KiB")
+        if result["checksum"] != base["checksum"]:
+            regressions.append(f"REGRESSION {name}: output changed")
+        base_counters = base.get("counters", {})
+        for counter, value in result["counters"].items():
+            if value != base_counters.get(counter, value):
+                regressions.append(f"REGRESSION {name}: {counter} {base_counters[counter]} -> {value}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for angular-sort.py and closest.py.")
+    benchmarks = parser.add_subparsers(dest="benchmark", required=True)
+
+    merge_memory_parser = benchmarks.add_parser("merge-memory", help="peak sort memory of each merge path")
+    merge_memory_parser.add_argument("input", nargs="?", default=os.path.join(SCRIPT_DIR, "input-points.txt"),
+                                     help="point file in the angular-sort.py input format")
+    merge_memory_parser.set_defaults(run=merge_memory)
+
+    point_memory_parser = benchmarks.add_parser("point-memory", help="memory per point of each storage layout")
+    point_memory_parser.add_argument("input", nargs="?", default=os.path.join(SCRIPT_DIR, "input-points.txt"),
+                                     help="point file, with or without a count header")
+    point_memory_parser.set_defaults(run=point_memory)
+
+    crossover_parser = benchmarks.add_parser("closest-crossover", help="closest.py algorithms by input size")
+    crossover_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000],
+                                  help="numbers of points to time")
+    crossover_parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the fastest counts")
+    crossover_parser.set_defaults(run=closest_crossover)
+
+    scaling_parser = benchmarks.add_parser("closest-scaling", help="closest.py run time by number of workers")
+    scaling_parser.add_argument("--size", type=int, default=1000000, help="number of points")
+    scaling_parser.add_argument("--workers", type=int, nargs="+", default=default_worker_counts(),
+                                help="numbers of workers to time (default: powers of two up to the core count)")
+    scaling_parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the fastest counts")
+    scaling_parser.set_defaults(run=closest_scaling)
+
+    suite_parser = benchmarks.add_parser("suite", help="every engine on seeded adversarial distributions")
+    suite_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                              help="numbers of points, up to 10000000 (default 1000 10000 100000)")
+    suite_parser.add_argument("--distributions", nargs="+", choices=SUITE_DISTRIBUTIONS, default=SUITE_DISTRIBUTIONS,
+                              help="point distributions to generate (default all)")
+    suite_parser.add_argument("--programs", nargs="+", choices=("angular-sort", "closest"),
+                              default=["angular-sort", "closest"], help="scripts to run (default both)")
+    suite_parser.add_argument("--repeat", type=int, default=1,
+                              help="runs per measurement; the fastest time and the largest RSS count")
+    suite_parser.add_argument("--output", help="JSON file the measurements are written to")
+    suite_parser.add_argument("--baseline", help="JSON file of an earlier run to flag regressions against")
+    suite_parser.add_argument("--tolerance", type=float, default=0.25,
+                              help="relative growth of time or peak RSS allowed before a regression (default 0.25)")
+    suite_parser.set_defaults(run=suite)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,15 @@
 
+import sys
+
+from point_loader import convert_point_file
+
+# Converting a point file between text and binary, so closest.py can read the binary form:
+#   python3 closest-output-converter.py --to-binary points.txt points.bin
+#   python3 closest-output-converter.py --to-text points.bin points.txt
+if len(sys.argv) == 4 and sys.argv[1] in ("--to-binary", "--to-text"):
+	convert_point_file(sys.argv[2], sys.argv[3], sys.argv[1][len("--to-"):])
+	sys.exit()
+
 x = input()
 x = x.split()
 f = float(x[-1])
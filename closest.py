@@ -1,35 +1,39 @@
+import os
 import sys
 import math
-from functools import cmp_to_key
+import mmap
+import heapq
+import random
+import signal
+import socket
+import argparse
+import tempfile
+from functools import partial
+from array import array
+from bisect import bisect_left, bisect_right
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
 
+import point_set
+from external_sort import ExternalSorter, chunk_bytes, parse_memory_limit, record_blocks
+from point_file import columns, release_points, write_point_blocks
+from metrics import NO_METRICS, PROFILERS, Metrics, run_profiled
+from result_cache import DEFAULT_CACHE_SIZE, ResultCache
+from point_loader import load_points, iter_points, iter_point_lines
 
-class Point:
-    def __init__(self, x, y):
-        """
-        Initializes a Point with x and y coordinates.
-        :param x: x-coordinate of the point.
-        :param y: y-coordinate of the point.
-        """
-        self.x = x
-        self.y = y
+try:
+    import numpy as np
+except ImportError:  # Shuffles faster for the grid; required by --algorithm=numpy
+    np = None
 
-    def __repr__(self):
-        """
-        Returns a string representation of the Point.
-        """
-        return "%s %s" % (self.x, self.y)
+try:
+    import resource
+except ImportError:  # No peak resident memory report for --memory-limit, e.g. on Windows
+    resource = None
 
-    def get_x(self):
-        """
-        Returns the x-coordinate of the point.
-        """
-        return self.x
 
-    def get_y(self):
-        """
-        Returns the y-coordinate of the point.
-        """
-        return self.y
+class Point(point_set.Point):
+    __slots__ = ()
 
     def distance(self, other):
         """
@@ -64,184 +68,586 @@ class Point:
         return math.isclose(self.y, other.y, rel_tol=1e-8)
 
 
-def compare_x_value(left_value, right_value):
-    """
-    Comparator function for sorting by x-coordinate
-    :param left_value: First Point object.
-    :param right_value: Second Point object.
-    :return: -1 if left_value.x < right_value.x, 1 if greater, 0 if equal.
-    """
-    if left_value.x < right_value.x:
-        return -1
-    elif left_value.x > right_value.x:
-        return 1
-    else:
-        return 0
+class IndexedPoint(Point):
+    __slots__ = ("index",)
+
+    def __init__(self, x, y, index):
+        """
+        A Point that remembers its index, so a sweep can report which points form a pair.
+        :param x: x-coordinate
+        :param y: y-coordinate
+        :param index: Index of the point in its PointSet
+        """
+        super().__init__(x, y)
+        self.index = index
+
 
+SWEEP_RELEASE_POINTS = 1 << 16  # Points swept between calls of the release callback
+# Options that change what is printed, and so are part of a --cache key
+CACHED_OPTIONS = ("algorithm", "workers", "k_closest", "radius", "memory_limit")
 
-def closest_distance_sweep_line(points):
+
+def closest_distance_sweep_line(points, order, metrics=NO_METRICS, release=None):
     """
     Finds the closest distance between a pair of points using a sweep line algorithm.
-    :param points: List of Point objects.
+    Points are visited by index; only the points inside the window get a Point view in the tree.
+    :param points: PointSet.
+    :param order: Point indices sorted by x-coordinate (see PointSet.order_by_x).
+    :param metrics: Metrics counting distance evaluations and the window and tree sizes.
+    :param release: Optional callable, called every SWEEP_RELEASE_POINTS points with the position in
+                    order of the window's left edge; the points before it are never read again.
     :return: The shortest distance found between any two points.
     """
-    points_len = len(points)
+    points_len = len(order)
     if points_len < 2:
         return float('inf')
+    xs = points.xs
 
-    # Use a binary search tree to hold points sorted by y
-    bst = BST()
-    bst.insert(points[0])
+    # Use a balanced binary search tree to hold points sorted by y
+    bst = CountingBST(metrics) if metrics.enabled else BST()
+    bst.insert(points[order[0]], order[0])
 
     # Initialize the closest pair distance
     D = float('inf')
 
     pi = 0  # Left boundary index
 
-    for j in range(1, points_len):
-        pj = points[j]  # Initialize right boundary index point
+    for block_start in range(1, points_len, SWEEP_RELEASE_POINTS):
+        for j in range(block_start, min(block_start + SWEEP_RELEASE_POINTS, points_len)):
+            pj = points[order[j]]  # Initialize right boundary index point
+
+            # Remove points outside the current D x 2D window
+            while pi < j and pj.x - xs[order[pi]] > D:
+                bst.remove(points[order[pi]], order[pi])
+                pi += 1
+
+            # Check the distance to every point in the D x 2D bounding box
+            # save the smallest in D if smaller than current D value
+            for pk in bst.values_between(pj.y - D, pj.y + D):
+                distance = pj.distance(pk)
+                if distance < D:
+                    D = distance
+            if D == 0:
+                return D  # Duplicate points; nothing can be closer, and the window would never shrink again
+
+            # Insert current point into the binary search tree
+            bst.insert(pj, order[j])
+
+        if release is not None:
+            release(pi)
+
+    return D
+
+
+# Peak bytes per byte of point text while a --memory-limit chunk is sorted by x: its order and
+# coordinates stay in flat arrays, and its runs are spilled as three columns
+EXTERNAL_BYTES_PER_INPUT_BYTE = 12
+
+
+def closest_distance_external(input_stream, memory_limit, metrics=NO_METRICS):
+    """
+    Finds the closest distance between a pair of points that do not fit in memory. The input is
+    sorted by x with an external merge sort into a temporary binary point file, which is then
+    memory-mapped and swept by closest_distance_sweep_line(). The pages behind the sweep window are
+    dropped as the sweep moves on, so only the window and the tree stay resident, however many
+    points there are. Equal x-coordinates keep their input order, as in PointSet.order_by_x(), so
+    the sweep visits the points exactly as the in-memory run does.
+    :param input_stream: Binary stream the points are read from, e.g. sys.stdin.buffer.
+    :param memory_limit: Bytes the sort may use, roughly.
+    :param metrics: Metrics the sort and sweep phases are timed in.
+    :return: The shortest distance found between any two points.
+    """
+    with tempfile.TemporaryFile(prefix="closest-") as sorted_file:
+        with metrics.phase("sort"):
+            count = external_sort_by_x(input_stream, memory_limit, sorted_file, metrics)
+            sorted_file.flush()
+        mapping = mmap.mmap(sorted_file.fileno(), 0, access=mmap.ACCESS_READ)
+        xs, ys = columns(mapping)
+        released = 0  # Points before this one have been dropped from memory
+
+        def release(stop):
+            nonlocal released
+            release_points(mapping, count, released, stop)
+            released = stop
+
+        try:
+            with metrics.phase("sweep"):
+                return closest_distance_sweep_line(point_set.PointSet(xs, ys, Point), range(count), metrics, release)
+        finally:
+            xs.release()
+            ys.release()
+            mapping.close()
+
+
+def external_sort_by_x(input_stream, memory_limit, output_file, metrics=NO_METRICS):
+    """
+    Sorts points by x without holding them all in memory. The input is read in chunks sized to
+    memory_limit; each chunk is sorted and spilled as a run of (x, index, y) records, and the runs
+    are merged straight into a binary point file.
+    :param input_stream: Binary stream the points are read from.
+    :param memory_limit: Bytes the sort may use, roughly.
+    :param output_file: Binary file the sorted points are written to, as a binary point file.
+    :param metrics: Metrics the spilled runs and merge passes are counted in.
+    :return: Number of points.
+    """
+    sorter = ExternalSorter(3, memory_limit)
+    try:
+        count = 0  # Index of the chunk's first point
+        for xs, ys in iter_points(input_stream, chunk_bytes(memory_limit, EXTERNAL_BYTES_PER_INPUT_BYTE)):
+            chunk = point_set.PointSet(xs, ys)
+            order = chunk.order_by_x()
+            indices = np.frombuffer(order, dtype=np.int64) + count if np is not None else \
+                [count + index for index in order]
+            sorter.spill([point_set.select(chunk.xs, order), indices, point_set.select(chunk.ys, order)])
+            count += len(chunk)
+            del chunk, order, indices  # Freed before the next chunk is read
+        records = sorter.merge()
+        metrics.count("spilled_runs", sorter.spills)
+        metrics.count("merge_passes", sorter.passes + 1)
+        write_point_blocks(output_file, count, record_blocks(records, (0, 2)))
+    finally:
+        sorter.close()
+    return count
+
+
+def closest_distance_parallel(points, order, workers):
+    """
+    Finds the closest distance between a pair of points on several cores. The x-sorted points are
+    split into one slab of consecutive points per worker, and closest_distance_sweep_line() runs on
+    every slab in a process pool. The coordinates reach the workers through shared memory. Pairs
+    crossing a slab boundary are then found by sweeping the strip of width D on both sides of it.
+    :param points: PointSet.
+    :param order: Point indices sorted by x-coordinate (see PointSet.order_by_x).
+    :param workers: Number of worker processes.
+    :return: The shortest distance found between any two points.
+    """
+    points_len = len(order)
+    slabs = min(workers, points_len // 2)  # Every slab gets at least a pair of points
+    if slabs < 2:
+        return closest_distance_sweep_line(points, order)
+
+    # Coordinates in x-order, so every slab and every strip is a range of positions
+    sorted_points = point_set.PointSet(point_set.select(points.xs, order), point_set.select(points.ys, order), Point)
+    shared = shared_memory.SharedMemory(create=True, size=sorted_points.nbytes())
+    try:
+        coordinate_bytes = points_len * sorted_points.xs.itemsize
+        shared.buf[:coordinate_bytes] = sorted_points.xs.tobytes()
+        shared.buf[coordinate_bytes:2 * coordinate_bytes] = sorted_points.ys.tobytes()
+        bounds = [points_len * slab // slabs for slab in range(slabs + 1)]
+        with ProcessPoolExecutor(slabs) as executor:
+            D = min(executor.map(sweep_slab, [shared.name] * slabs, [points_len] * slabs, bounds[:-1], bounds[1:]))
+    finally:
+        shared.close()
+        shared.unlink()
+
+    # A pair closer than D across the boundary before position b lies within D of both
+    # xs[b - 1] and xs[b]; the strip holding all such pairs is again a range of positions
+    xs = sorted_points.xs
+    for boundary in bounds[1:-1]:
+        if D == 0:
+            break  # Duplicate points; no strip can hold a closer pair
+        start = bisect_left(xs, xs[boundary] - D)
+        stop = bisect_right(xs, xs[boundary - 1] + D)
+        D = min(D, closest_distance_sweep_line(sorted_points, range(start, stop)))
+    return D
+
+
+def sweep_slab(shared_name, points_len, start, stop):
+    """
+    Runs closest_distance_sweep_line() on one slab of the points; see closest_distance_parallel().
+    :param shared_name: Name of the shared memory block holding the x-sorted xs followed by the ys.
+    :param points_len: Number of points in the shared memory block.
+    :param start: Position of the slab's first point.
+    :param stop: Position after the slab's last point.
+    :return: The shortest distance found between two points of the slab.
+    """
+    xs = array("d")
+    ys = array("d")
+    shared = shared_memory.SharedMemory(name=shared_name)
+    try:
+        xs.frombytes(shared.buf[start * xs.itemsize:stop * xs.itemsize])
+        ys.frombytes(shared.buf[(points_len + start) * ys.itemsize:(points_len + stop) * ys.itemsize])
+    finally:
+        shared.close()
+    return closest_distance_sweep_line(point_set.PointSet(xs, ys, Point), range(stop - start))
+
 
-        # Remove points outside the current D x 2D window
-        while pi < j and pj.x - points[pi].x > D:
-            bst.remove(points[pi].y)
+def k_closest_pairs(points, order, k, metrics=NO_METRICS):
+    """
+    Finds the k closest pairs of points with the sweep line of closest_distance_sweep_line().
+    A bounded max-heap holds the k best pairs found so far, and the window is as wide as the worst
+    of them: once k pairs are known, no point further than that in x or y can improve the heap.
+    Pairs at equal distances are ranked by their point indices, so the result is deterministic.
+    :param points: PointSet.
+    :param order: Point indices sorted by x-coordinate (see PointSet.order_by_x).
+    :param k: Number of pairs to find.
+    :param metrics: Metrics counting distance evaluations and the window and tree sizes.
+    :return: List of up to k (distance, first index, second index) tuples, closest first,
+             with first < second.
+    """
+    xs = points.xs
+    ys = points.ys
+    bst = CountingBST(metrics) if metrics.enabled else BST()
+    heap = []  # The best pairs as (-distance, -first, -second), so heap[0] is the worst of them
+    bound = float('inf')  # Distance of the worst pair in a full heap
+
+    pi = 0  # Left boundary index
+    for j, index in enumerate(order):
+        pj = IndexedPoint(xs[index], ys[index], index)
+
+        # Remove points outside the current bound x 2 bound window; points exactly at the bound
+        # stay, as a pair at the bound may still beat a tie on the indices
+        while pi < j and pj.x - xs[order[pi]] > bound:
+            bst.remove(points[order[pi]], order[pi])
             pi += 1
 
-        # Query the binary search tree for points within the D x 2D bounding box
-        successor = bst.successor(pj.y)
-        predecessor = bst.predecessor(pj.y)
+        for pk in bst.values_between(pj.y - bound, pj.y + bound):
+            pair = (-pj.distance(pk), -min(index, pk.index), -max(index, pk.index))
+            if len(heap) < k:
+                heapq.heappush(heap, pair)
+            elif pair > heap[0]:
+                heapq.heapreplace(heap, pair)
+            else:
+                continue
+            if len(heap) == k:
+                bound = -heap[0][0]
+
+        bst.insert(pj, index)
+
+    return sorted((-distance, -first, -second) for distance, first, second in heap)
+
+
+def pairs_within_radius(points, order, radius, metrics=NO_METRICS):
+    """
+    Finds every pair of points at most radius apart with the sweep line of
+    closest_distance_sweep_line(), using a fixed window of width radius.
+    :param points: PointSet.
+    :param order: Point indices sorted by x-coordinate (see PointSet.order_by_x).
+    :param radius: Largest distance of a pair to report.
+    :param metrics: Metrics counting distance evaluations and the window and tree sizes.
+    :return: Generator of (distance, first index, second index) tuples with first < second, in the
+             order the sweep finds them.
+    """
+    xs = points.xs
+    ys = points.ys
+    bst = CountingBST(metrics) if metrics.enabled else BST()
+
+    pi = 0  # Left boundary index
+    for j, index in enumerate(order):
+        pj = IndexedPoint(xs[index], ys[index], index)
 
-        # Check valid nearby points
-        candidates = []
-        if successor:
-            candidates.append(successor.value)
-        if predecessor:
-            candidates.append(predecessor.value)
+        # Remove points outside the radius x 2 radius window
+        while pi < j and pj.x - xs[order[pi]] > radius:
+            bst.remove(points[order[pi]], order[pi])
+            pi += 1
 
-        # Check the distance of each valid group of points
-        # save the smallest in D if smaller than current D value
-        for pk in candidates:
+        for pk in bst.values_between(pj.y - radius, pj.y + radius):
             distance = pj.distance(pk)
-            if distance < D:
-                D = distance
+            if distance <= radius:
+                yield distance, min(index, pk.index), max(index, pk.index)
+
+        bst.insert(pj, index)
+
+
+def write_pairs(stream, points, pairs):
+    """
+    Writes pairs of points one per line as "x1 y1 x2 y2 distance".
+    :param stream: Text stream to write to, e.g. sys.stdout.
+    :param points: PointSet the pairs index into.
+    :param pairs: Iterable of (distance, first index, second index) tuples.
+    """
+    for distance, first, second in pairs:
+        stream.write(f"{points[first]} {points[second]} {distance}\n")
+
+
+GRID_SEED = 0  # Seed of the insertion order shuffle, so runs are repeatable
+# Cells are made slightly wider than 2D so that rounding in x / cell_size cannot move a point
+# closer than D into a cell the quadrant test skips (safe while |x| / D stays below ~1e12)
+GRID_CELL_MARGIN = 1.001
+
+
+class ClosestPairGrid:
+    def __init__(self, points):
+        """
+        Maintains the closest distance D of the points added so far, by hashing them into square
+        cells whose side is between 2D and 4D. A point closer than D to a new point lies in the new
+        point's cell or in one of the three cells next to the quadrant of the cell it falls in.
+        When D drops below a quarter of the cell side, every point is rehashed into cells of side 2D;
+        in random insertion order that happens O(log n) times and costs O(n) expected work overall
+        (Rabin; Khuller and Matias).
+        :param points: PointSet holding the points that will be added.
+        """
+        self.points = points
+        self.distance = float('inf')  # D: closest distance among the points added so far
+        self.cell_size = 0.0
+        self.cells = {}  # (column, row) -> point index, or list of point indices once a cell holds several
+        self.added = []  # Indices of the points added so far
+
+    def add(self, index):
+        """
+        Adds a point and updates D.
+        :param index: Index of the point to add.
+        :return: True if D got smaller.
+        """
+        if self.distance == 0:  # Duplicate points seen; D cannot change and the points are no longer hashed
+            self.added.append(index)
+            return False
+        xs = self.points.xs
+        ys = self.points.ys
+        x = xs[index]
+        y = ys[index]
+        closest = self.distance
+        cells = self.cells
+
+        if cells:
+            scaled_x = x / self.cell_size
+            scaled_y = y / self.cell_size
+            column = math.floor(scaled_x)
+            row = math.floor(scaled_y)
+            # Neighbouring column and row on the side of the cell the point is closer to
+            other_column = column - 1 if scaled_x - column < 0.5 else column + 1
+            other_row = row - 1 if scaled_y - row < 0.5 else row + 1
+            for key in ((column, row), (column, other_row), (other_column, row), (other_column, other_row)):
+                cell = cells.get(key)
+                if cell is None:
+                    continue
+                for other in ((cell,) if type(cell) is int else cell):
+                    distance = math.sqrt((x - xs[other]) ** 2 + (y - ys[other]) ** 2)
+                    if distance < closest:
+                        closest = distance
+        elif self.added:  # Only one point so far, and it is in no cell yet
+            other = self.added[0]
+            closest = math.sqrt((x - xs[other]) ** 2 + (y - ys[other]) ** 2)
+
+        self.added.append(index)
+        shrunk = closest < self.distance
+        self.distance = closest
+        if closest == 0:
+            self.cells = {}  # D cannot shrink any further; stop hashing points
+        elif closest < self.cell_size / 4 or (shrunk and not cells):
+            self.rebuild()
+        elif cells:
+            add_to_cell(cells, (column, row), index)
+        return shrunk
+
+    def rebuild(self):
+        """
+        Rehashes every point added so far into cells of side 2D.
+        """
+        self.cell_size = cell_size = 2 * self.distance * GRID_CELL_MARGIN
+        self.cells = cells = {}
+        xs = self.points.xs
+        ys = self.points.ys
+        for index in self.added:
+            add_to_cell(cells, (math.floor(xs[index] / cell_size), math.floor(ys[index] / cell_size)), index)
+
+
+def add_to_cell(cells, key, index):
+    """
+    Adds a point to a grid cell. Most cells hold one point, stored as a bare index.
+    :param cells: Dictionary of cells of a ClosestPairGrid.
+    :param key: (column, row) of the cell.
+    :param index: Index of the point.
+    """
+    cell = cells.get(key)
+    if cell is None:
+        cells[key] = index
+    elif type(cell) is int:
+        cells[key] = [cell, index]
+    else:
+        cell.append(index)
+
+
+def closest_distance_grid(points, seed=GRID_SEED):
+    """
+    Finds the closest distance between a pair of points by adding them to a ClosestPairGrid in
+    random order, for O(n) expected work.
+    :param points: PointSet.
+    :param seed: Seed of the random insertion order.
+    :return: The shortest distance found between any two points.
+    """
+    if np is not None:
+        order = np.random.default_rng(seed).permutation(len(points)).tolist()
+    else:
+        order = list(range(len(points)))
+        random.Random(seed).shuffle(order)
+
+    grid = ClosestPairGrid(points)
+    for index in order:
+        grid.add(index)
+        if grid.distance == 0:
+            break  # Duplicate points; nothing can be closer
+    return grid.distance
+
 
-        # Insert current point into the binary search tree
-        bst.insert(pj)
+def stream_closest_distance(point_stream, grid, metrics=NO_METRICS):
+    """
+    Adds points to a ClosestPairGrid as they arrive and prints the closest distance whenever it
+    changes. Each point costs O(1) expected time, plus a rehash of the grid when D has shrunk to
+    under a quarter of the cell side, instead of a new O(n log n) run over all points so far.
+    D is measured with Point.distance()'s formula, so every printed line matches a batch run of
+    closest.py over the same prefix of the points.
+    :param point_stream: Iterable of (x, y) tuples, e.g. from point_loader.iter_point_lines().
+    :param grid: ClosestPairGrid whose PointSet the points are appended to; it may already hold points.
+    :param metrics: Metrics counting the points and the printed updates.
+    """
+    xs = grid.points.xs
+    ys = grid.points.ys
+    for x, y in point_stream:
+        xs.append(x)
+        ys.append(y)
+        metrics.count("points")
+        if grid.add(len(xs) - 1):
+            metrics.count("distance_updates")
+            print(f"after {len(xs)} points: The closest pair of points is {grid.distance}", flush=True)
+
+
+def serve_closest_distance(socket_path, grid, metrics=NO_METRICS):
+    """
+    Accepts connections on a Unix socket, one at a time, and streams the points every client
+    sends into the same grid; see stream_closest_distance(). A client that sends a malformed line
+    is disconnected, and the points it sent before that line are kept. Runs until interrupted or
+    terminated, then removes the socket.
+    :param socket_path: Path the socket is created at.
+    :param grid: ClosestPairGrid the points are added to.
+    :param metrics: Metrics counting the points, the printed updates and the connections.
+    """
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(socket_path)
+    except OSError as error:
+        server.close()
+        sys.exit(f"closest.py: cannot create socket {socket_path}: {error.strerror}")
+    signal.signal(signal.SIGTERM, signal.default_int_handler)  # Terminating also cleans up
+    try:
+        server.listen()
+        while True:
+            connection, _ = server.accept()
+            metrics.count("connections")
+            with connection, connection.makefile("rb") as client:
+                try:
+                    stream_closest_distance(iter_point_lines(client), grid, metrics)
+                except ValueError as error:
+                    print(f"closest.py: {error}", file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.remove(socket_path)
+
+
+DC_STRIP_NEIGHBOURS = 7  # A strip point can only be closer than D to its next 7 y-neighbours
+DC_ROUNDING_SLACK = 1 + 1e-9  # Relative margin covering rounding differences between distance formulas
+
+
+def closest_distance_divide_and_conquer(points):
+    """
+    Finds the closest distance between a pair of points by divide and conquer, with NumPy doing
+    the work. The points are sorted by x and by y once with argsort. Ranges of the x-order are
+    halved down to single points, and the levels of that recursion are solved bottom-up, all
+    ranges of a level at once: the strips around their split lines are checked in a few batched
+    distance computations instead of one Python loop iteration per point.
+    :param points: PointSet.
+    :return: The shortest distance found between any two points.
+    """
+    xs, ys = points.numpy()
+    count = len(xs)
+    by_x = np.argsort(xs, kind="stable")
+    xs = xs[by_x]  # Coordinates in x-order; the ranges of the recursion are ranges of these arrays
+    ys = ys[by_x]
+    y_ranks = np.empty(count, dtype=np.int64)
+    y_ranks[np.argsort(ys, kind="stable")] = np.arange(count)
+
+    D = math.inf
+    order = np.arange(count)  # Positions sorted by range, then by y; the ranges hold one point each
+    level = 0
+    while (1 << level) < count and D > 0:  # D == 0 means duplicate points; nothing can be closer
+        level += 1  # Ranges now hold 2 ** level points; their halves are the ranges of the last level
+        ranges = order >> level
+        # Merges the y-orders of the two halves; order already consists of these sorted halves
+        order = order[np.argsort(ranges * count + y_ranks[order], kind="stable")]
+        ranges = order >> level
+        middles = (ranges << level) + (1 << (level - 1))  # First position right of each split line
+        split = middles < count  # The last range may have no right half
+        middles[~split] = 0
 
+        # Points closer than D to their split line, sorted by range and y. D is never larger than
+        # the closest distance within either half, so a pair closer than D lies within
+        # DC_STRIP_NEIGHBOURS of each other in this order and each shift compares such pairs at once
+        strip = split & (np.abs(xs[order] - xs[middles]) < D)
+        strip_ranges = ranges[strip]
+        strip_xs = xs[order[strip]]
+        strip_ys = ys[order[strip]]
+        for shift in range(1, min(DC_STRIP_NEIGHBOURS, (1 << level) - 1) + 1):
+            same_range = strip_ranges[shift:] == strip_ranges[:-shift]
+            if not same_range.any():
+                continue
+            distances = np.sqrt((strip_xs[shift:] - strip_xs[:-shift]) ** 2 + (strip_ys[shift:] - strip_ys[:-shift]) ** 2)
+            distances[~same_range] = math.inf
+            closest = distances.min()
+            if closest > D * DC_ROUNDING_SLACK:
+                continue
+            # NumPy squares exactly where Point.distance()'s ** 2 calls pow(), which can differ in the
+            # last bit; the nearest pairs are measured again the way the other engines measure them
+            for position in np.flatnonzero(distances <= closest * DC_ROUNDING_SLACK).tolist():
+                first = Point(float(strip_xs[position]), float(strip_ys[position]))
+                second = Point(float(strip_xs[position + shift]), float(strip_ys[position + shift]))
+                D = min(D, first.distance(second))
     return D
 
 
 class TreeNode:
-    def __init__(self, value):
+    def __init__(self, value, key):
         """
         Creates a new TreeNode object for the binary search tree.
         :param value: The value to be stored in the node (Point object).
+        :param key: (y, x, id) tuple the tree is ordered by; unique even when points share a y value.
         """
         self.value = value  # Stores the Point object or other data
+        self.key = key
         self.left = None
         self.right = None
-        self.parent = None
+        self.height = 1  # Height of the subtree rooted at this node
 
 
 class BST:
     def __init__(self):
         """
-        Creates a new, empty binary search tree object
+        Creates a new, empty binary search tree object.
+        The tree is an AVL tree: subtree heights differ by at most one, so every operation is O(log n)
+        whatever order the points are inserted in.
         """
         self.root = None
 
-    def insert(self, value):
+    def insert(self, value, ident=0):
         """
         Insert a node with value as the Point object
         :param value: The Point object to insert.
+        :param ident: Identifier telling apart points with equal coordinates, e.g. the point's index.
         """
-        new_node = TreeNode(value)
-        if not self.root:
-            self.root = new_node
-            return
-
-        current = self.root
-        while True:
-            if value < current.value:
-                if current.left:
-                    current = current.left
-                else:
-                    current.left = new_node
-                    new_node.parent = current
-                    break
-            else:
-                if current.right:
-                    current = current.right
-                else:
-                    current.right = new_node
-                    new_node.parent = current
-                    break
+        self.root = insert_node(self.root, TreeNode(value, (value.y, value.x, ident)))
 
-    def remove(self, value):
+    def remove(self, value, ident=0):
         """
-        Removes a node from the binary search tree based on its y-coordinate value.
-        :param value: y-coordinate of the point to remove.
+        Removes the node holding value from the binary search tree.
+        :param value: The Point object to remove.
+        :param ident: Identifier the point was inserted with.
         """
-        current = self.root  # Start at the root node
-        parent = None  # Pointer to track the parent node
-
-        # # Find the node to be removed by traversing the binary search tree
-        while current and current.value.y != value:
-            parent = current
-            if value < current.value.y:
-                current = current.left  # Move left if the value is smaller
-            else:
-                current = current.right  # Move left if the value is larger
-
-        # If no node is found with the given value, return
-        if not current:
-            return
-
-        # If the node is a leaf node (has no children)
-        if not current.left and not current.right:
-            if not parent:
-                self.root = None  # If the tree had only one node, it becomes empt
-            elif parent.left == current:
-                parent.left = None  # Remove the reference from the parent
-            else:
-                parent.right = None  # Remove the reference from the parent
-
-        # If the node has one child
-        elif not current.left or not current.right:
-            child = current.left if current.left else current.right  # Find the existing child
-            if not parent:
-                self.root = child  # Update root if removing root node
-            elif parent.left == current:
-                parent.left = child  # Update parent's left child
-            else:
-                parent.right = child  # Update parent's right child
+        self.root = remove_node(self.root, (value.y, value.x, ident))
 
-        # If the node has two children
-        else:
-            successor_parent = current
-            successor = current.right
-            while successor.left:  # Find inorder successor
-                successor_parent = successor
-                successor = successor.left
-
-            current.value = successor.value  # Copy successor value to current node
-
-            # Remove successor node
-            if successor_parent.left == successor:
-                successor_parent.left = successor.right  # Update parent's left reference
-            else:
-                successor_parent.right = successor.right  # Update parent's right reference
-
-    def find(self, value):
+    def find(self, value, ident=0):
         """
         Finds and returns the node containing value, or None if not found
-        :param value: The Point object to insert.
-        :return: returns the value if found, otherwise returns None
+        :param value: The Point object to find.
+        :param ident: Identifier the point was inserted with.
+        :return: returns the node if found, otherwise returns None
         """
+        key = (value.y, value.x, ident)
         current = self.root
         while current:
-            if value == current.value:
+            if key == current.key:
                 return current
-            elif value < current.value:
+            elif key < current.key:
                 current = current.left
             else:
                 current = current.right
@@ -281,6 +687,29 @@ class BST:
                 current = current.left
         return result
 
+    def values_between(self, low, high):
+        """
+        Yields, in y order, the values of all nodes with low <= y <= high.
+        Subtrees entirely below low are skipped, so a query costs O(log n) plus the number of values.
+        :param low: Smallest y-coordinate to yield.
+        :param high: Largest y-coordinate to yield.
+        """
+        stack = []
+        current = self.root
+        while stack or current:
+            if current:
+                if current.key[0] < low:
+                    current = current.right  # current and its left subtree are below the range
+                else:
+                    stack.append(current)
+                    current = current.left
+            else:
+                current = stack.pop()
+                if current.key[0] > high:
+                    return
+                yield current.value
+                current = current.right
+
     def print_inorder(self, node):
         """
         Performs an in-order traversal of the BST and prints each Point.
@@ -293,19 +722,304 @@ class BST:
             self.print_inorder(node.right)  # Visit right subtree
 
 
+class CountingBST(BST):
+    def __init__(self, metrics):
+        """
+        A BST that counts what the sweep line does with it: the values every query yields (each is
+        one distance evaluation), the largest number of points in the window and the tallest the
+        tree grows. Only used when metrics are collected, so the plain BST pays nothing for it.
+        :param metrics: Metrics the counters are added to.
+        """
+        super().__init__()
+        self.metrics = metrics
+        self.size = 0  # Number of points in the tree
+
+    def insert(self, value, ident=0):
+        super().insert(value, ident)
+        self.size += 1
+        self.metrics.maximum("max_window_size", self.size)
+        self.metrics.maximum("max_tree_height", self.root.height)
+
+    def remove(self, value, ident=0):
+        super().remove(value, ident)
+        self.size -= 1
+
+    def values_between(self, low, high):
+        yielded = 0
+        try:
+            for value in super().values_between(low, high):
+                yielded += 1
+                yield value
+        finally:
+            self.metrics.count("distance_evaluations", yielded)
+
+
+def node_height(node):
+    """
+    :param node: TreeNode or None.
+    :return: Height of the subtree rooted at node (0 for an empty subtree).
+    """
+    return node.height if node else 0
+
+
+def rotate_left(node):
+    """
+    Rotates the subtree rooted at node to the left.
+    :param node: TreeNode with a right child.
+    :return: New root of the subtree.
+    """
+    pivot = node.right
+    node.right = pivot.left
+    pivot.left = node
+    node.height = 1 + max(node_height(node.left), node_height(node.right))
+    pivot.height = 1 + max(node_height(pivot.left), node_height(pivot.right))
+    return pivot
+
+
+def rotate_right(node):
+    """
+    Rotates the subtree rooted at node to the right.
+    :param node: TreeNode with a left child.
+    :return: New root of the subtree.
+    """
+    pivot = node.left
+    node.left = pivot.right
+    pivot.right = node
+    node.height = 1 + max(node_height(node.left), node_height(node.right))
+    pivot.height = 1 + max(node_height(pivot.left), node_height(pivot.right))
+    return pivot
+
+
+def rebalance(node):
+    """
+    Updates the height of node and rotates its subtree if the heights of its children differ by two.
+    :param node: TreeNode whose subtrees are balanced.
+    :return: New root of the subtree.
+    """
+    left_height = node_height(node.left)
+    right_height = node_height(node.right)
+    node.height = 1 + max(left_height, right_height)
+
+    if left_height > right_height + 1:  # Left heavy
+        if node_height(node.left.left) < node_height(node.left.right):
+            node.left = rotate_left(node.left)
+        return rotate_right(node)
+    if right_height > left_height + 1:  # Right heavy
+        if node_height(node.right.right) < node_height(node.right.left):
+            node.right = rotate_right(node.right)
+        return rotate_left(node)
+    return node
+
+
+def insert_node(node, new_node):
+    """
+    Inserts new_node into the subtree rooted at node.
+    :param node: Root of the subtree, or None.
+    :param new_node: TreeNode to insert.
+    :return: New root of the subtree.
+    """
+    if node is None:
+        return new_node
+    if new_node.key < node.key:
+        node.left = insert_node(node.left, new_node)
+    else:
+        node.right = insert_node(node.right, new_node)
+    return rebalance(node)
+
+
+def remove_node(node, key):
+    """
+    Removes the node with the given key from the subtree rooted at node, if there is one.
+    :param node: Root of the subtree, or None.
+    :param key: (y, x, id) key of the node to remove.
+    :return: New root of the subtree.
+    """
+    if node is None:
+        return None  # No node has the key
+    if key < node.key:
+        node.left = remove_node(node.left, key)
+    elif key > node.key:
+        node.right = remove_node(node.right, key)
+    else:
+        if node.left is None:
+            return node.right
+        if node.right is None:
+            return node.left
+        # Two children: replace the node by its inorder successor
+        successor = node.right
+        while successor.left:
+            successor = successor.left
+        node.right = remove_node(node.right, successor.key)
+        successor.left = node.left
+        successor.right = node.right
+        node = successor
+    return rebalance(node)
+
+
+def closest_distance(xs, ys, algorithm="sweep", workers=1, metrics=NO_METRICS):
+    """
+    Finds the closest distance between a pair of points; the library entry point behind closest.py.
+    :param xs: x-coordinates, as array('d'), a NumPy array or any sequence of floats.
+    :param ys: y-coordinates, parallel to xs.
+    :param algorithm: "sweep", "grid" or "numpy" (requires NumPy); all return the same distance.
+    :param workers: Number of processes the sweep is split across.
+    :param metrics: Metrics the counters and phase timings are added to.
+    :return: The shortest distance found between any two points, or inf for fewer than two points.
+    """
+    points = point_set.PointSet(xs, ys, Point)
+    if algorithm == "grid":
+        with metrics.phase("closest"):
+            return closest_distance_grid(points)
+    if algorithm == "numpy":
+        with metrics.phase("closest"):
+            return closest_distance_divide_and_conquer(points)
+
+    with metrics.phase("sort"):
+        order = points.order_by_x()  # sort the point indices based on the x value
+    with metrics.phase("sweep"):
+        if workers > 1:
+            return closest_distance_parallel(points, order, workers)
+        return closest_distance_sweep_line(points, order, metrics)
+
+
+def parse_args():
+    """
+    Parses the command line arguments.
+    :return: argparse.Namespace with algorithm, workers, k_closest, radius, stream, socket, memory_limit, cache,
+             cache_size, metrics and profile
+    """
+    parser = argparse.ArgumentParser(description="Prints the distance of the closest pair of points read from "
+                                                 "standard input.")
+    parser.add_argument("--algorithm", choices=("sweep", "grid", "numpy"), default="sweep",
+                        help="sweep runs the sweep line over a balanced tree, O(n log n); "
+                             "grid hashes the points into a grid in random order, O(n) expected; "
+                             "numpy divides and conquers with vectorized strip checks, O(n log n)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes the sweep is split across, one x-slab each (default 1)")
+    parser.add_argument("--k-closest", type=int, metavar="K",
+                        help="print the K closest pairs, closest first, as \"x1 y1 x2 y2 distance\" lines")
+    parser.add_argument("--radius", type=float, metavar="R",
+                        help="print every pair at most R apart as \"x1 y1 x2 y2 distance\" lines")
+    parser.add_argument("--stream", action="store_true",
+                        help="read points line by line and print the distance every time it changes")
+    parser.add_argument("--socket", metavar="PATH",
+                        help="like --stream, but read the points from clients of a Unix socket created at PATH")
+    parser.add_argument("--memory-limit", type=parse_memory_limit,
+                        help="sort out of core within about this much memory, e.g. 256M, and sweep the sorted "
+                             "points from a memory-mapped temporary file; reports the peak resident memory")
+    parser.add_argument("--cache", metavar="DIR",
+                        help="reuse the output of an earlier run on the same input with the same options, kept in "
+                             "the cache directory DIR (see result_cache.py)")
+    parser.add_argument("--cache-size", type=parse_memory_limit, default=DEFAULT_CACHE_SIZE,
+                        help=f"evict the least recently used results beyond this size (default {DEFAULT_CACHE_SIZE})")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write the run's counters and phase timings as JSON to FILE, or to standard error "
+                             "if FILE is -")
+    parser.add_argument("--profile", choices=PROFILERS,
+                        help="run under cProfile or tracemalloc and write the report to standard error")
+    args = parser.parse_args()
+    if args.algorithm == "numpy" and np is None:
+        parser.error("--algorithm=numpy requires NumPy")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.workers > 1 and args.algorithm != "sweep":
+        parser.error("--workers only applies to --algorithm=sweep")
+    if (args.stream or args.socket) and (args.algorithm != "sweep" or args.workers > 1):
+        parser.error("--stream and --socket always use the grid; they cannot be combined with --algorithm or "
+                     "--workers")
+    if args.k_closest is not None and args.k_closest < 1:
+        parser.error("--k-closest must be at least 1")
+    if args.radius is not None and not args.radius >= 0:
+        parser.error("--radius must be at least 0")
+    if args.k_closest is not None or args.radius is not None:
+        if args.k_closest is not None and args.radius is not None:
+            parser.error("--k-closest and --radius cannot be combined")
+        if args.algorithm != "sweep" or args.workers > 1 or args.stream or args.socket:
+            parser.error("--k-closest and --radius always use the sweep; they cannot be combined with "
+                         "--algorithm, --workers, --stream or --socket")
+    if args.memory_limit is not None and (args.algorithm != "sweep" or args.workers > 1 or args.stream or args.socket
+                                          or args.k_closest is not None or args.radius is not None):
+        parser.error("--memory-limit always uses the sweep; it cannot be combined with --algorithm, --workers, "
+                     "--stream, --socket, --k-closest or --radius")
+    if args.cache is not None and (args.stream or args.socket):
+        parser.error("--cache cannot be combined with --stream or --socket")
+    return args
+
+
 def main():
+    args = parse_args()
+    metrics = Metrics() if args.metrics is not None else NO_METRICS
+    find = partial(find_closest_pair, args, metrics)
+    if args.cache is not None:
+        try:
+            cache = ResultCache(args.cache, args.cache_size, metrics)
+        except OSError as error:
+            sys.exit(f"closest.py: {error}")
+        find = partial(cache.run, "closest.py", {name: getattr(args, name) for name in CACHED_OPTIONS},
+                       sys.stdin.buffer, None, find)
+    else:
+        find = partial(find, sys.stdin.buffer)
+    run_profiled(args.profile, find)
+    if args.metrics is not None:
+        metrics.write("closest.py", args.metrics)
+
+
+def find_closest_pair(args, metrics, input_stream):
+    """
+    Prints the distance of the closest pair of the points of the input.
+    :param args: argparse.Namespace from parse_args().
+    :param metrics: Metrics the counters and phase timings of the run are added to.
+    :param input_stream: Binary stream the points are read from, e.g. sys.stdin.buffer.
+    """
+    if args.stream or args.socket:
+        grid = ClosestPairGrid(point_set.PointSet(array("d"), array("d"), Point))
+        if args.socket:
+            serve_closest_distance(args.socket, grid, metrics)
+            return
+        try:
+            stream_closest_distance(iter_point_lines(input_stream), grid, metrics)
+        except ValueError as error:
+            sys.exit(f"closest.py: {error}")
+        return
+
+    if args.memory_limit is not None:
+        try:
+            distance = closest_distance_external(input_stream, args.memory_limit, metrics)
+        except ValueError as error:
+            sys.exit(f"closest.py: {error}")
+        print("The closest pair of points is", distance)
+        if resource is not None:
+            # ru_maxrss is in kilobytes, except on macOS where it is in bytes
+            peak_bytes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+            metrics.count("peak_rss_bytes", peak_bytes)
+            print(f"peak resident memory = {peak_bytes} bytes", file=sys.stderr)
+        return
+
     # Collects the points to be read from the standard input stream
-    data = sys.stdin.read().splitlines()
+    try:
+        with metrics.phase("parse"):
+            xs, ys = load_points(input_stream)
+    except ValueError as error:
+        sys.exit(f"closest.py: {error}")
 
-    # Creates a list of the points that is sorted by the x value
-    points = [Point(*map(float, line.split())) for line in data]
+    # Stores the points as two coordinate arrays
+    points = point_set.PointSet(xs, ys, Point)
 
-    # sort the points based on the x value
-    points.sort(key=cmp_to_key(compare_x_value))
+    if args.k_closest is not None or args.radius is not None:
+        with metrics.phase("sort"):
+            order = points.order_by_x()
+        with metrics.phase("sweep"):
+            if args.k_closest is not None:
+                pairs = k_closest_pairs(points, order, args.k_closest, metrics)
+            else:
+                pairs = pairs_within_radius(points, order, args.radius, metrics)
+            write_pairs(sys.stdout, points, pairs)
+        return
 
     # Calculates the shortest distance between points and prints the value
-    distance = closest_distance_sweep_line(points)
+    distance = closest_distance(points.xs, points.ys, args.algorithm, args.workers, metrics)
     print("The closest pair of points is", distance)
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import os
+import heapq
+import argparse
+import tempfile
+from array import array
+from itertools import chain, islice
+
+try:
+    import numpy as np
+except ImportError:  # Records are interleaved with itertools without NumPy
+    np = None
+
+RUN_BUFFER_BYTES = 1 << 16  # Bytes read from each run at a time while merging
+MAX_FAN_IN = 128  # Runs merged at once, whatever the memory limit, to bound open files
+MIN_MEMORY_LIMIT = 1 << 20  # Smallest accepted --memory-limit
+OUTPUT_BLOCK_RECORDS = 1 << 12  # Merged records handed on, e.g. formatted and written, at a time
+SIZE_SUFFIXES = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def parse_memory_limit(text):
+    """
+    Parses a --memory-limit value: a number of bytes with an optional K, M or G suffix.
+    :param text: Command line value, e.g. "512M"
+    :return: Number of bytes
+    """
+    multiplier = SIZE_SUFFIXES.get(text[-1:].upper(), 1)
+    digits = text[:-1] if multiplier > 1 else text
+    try:
+        limit = int(float(digits) * multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {text}")
+    if limit < MIN_MEMORY_LIMIT:
+        raise argparse.ArgumentTypeError(f"must be at least {MIN_MEMORY_LIMIT >> 20}M")
+    return limit
+
+
+def chunk_bytes(memory_limit, bytes_per_input_byte):
+    """
+    Sizes the chunks the input is read in, so that parsing, sorting and spilling a chunk stays
+    within the memory limit.
+    :param memory_limit: Bytes the sort may use, roughly
+    :param bytes_per_input_byte: Peak bytes the caller takes per byte of point text while it parses,
+                                 sorts and spills a chunk
+    :return: Bytes of point text per chunk
+    """
+    return max(1, memory_limit // bytes_per_input_byte)
+
+
+def record_blocks(records, fields):
+    """
+    Groups merged records into blocks of OUTPUT_BLOCK_RECORDS and picks fields out of them.
+    :param records: Iterator of records in sorted order, e.g. from ExternalSorter.merge()
+    :param fields: Positions of the fields to pick, e.g. the x- and y-coordinate
+    :return: Generator of tuples holding one tuple of values per picked field
+    """
+    while block := list(islice(records, OUTPUT_BLOCK_RECORDS)):
+        columns = tuple(zip(*block))
+        yield tuple(columns[field] for field in fields)
+
+
+class ExternalSorter:
+
+    def __init__(self, width, memory_limit):
+        """
+        Sorts more records than fit in memory. Callers sort records in memory-sized batches and
+        spill each sorted batch as a run to a temporary binary file; merge() then combines the runs
+        with buffered k-way merges, in several passes if there are more runs than the fan-in.
+        A record is a tuple of width floats ordered as a tuple, so its first fields are the sort
+        key followed by a sequence number when equal keys must keep their order.
+        :param width: Number of float64 fields per record
+        :param memory_limit: Bytes the merge buffers may take, which sets the fan-in
+        """
+        self.width = width
+        self.fan_in = max(2, min(MAX_FAN_IN, memory_limit // (4 * RUN_BUFFER_BYTES)))
+        self.directory = tempfile.TemporaryDirectory(prefix="external-sort-")
+        self.runs = []  # Numbers of the runs not merged yet, in spill order
+        self.run_count = 0  # Runs written so far, spilled or merged
+        self.spills = 0  # Runs spilled by the caller
+        self.passes = 0  # Merge passes that wrote intermediate runs
+        self.merges = []  # (pass, input run numbers, output run number) of every intermediate merge
+
+    def spill(self, columns):
+        """
+        Writes one sorted batch of records to a new run file.
+        :param columns: width parallel sequences of floats (NumPy arrays, array('d') or lists), in sorted order
+        """
+        if np is not None:
+            records = np.column_stack([np.asarray(column, dtype=np.float64) for column in columns])
+        else:
+            records = array("d", chain.from_iterable(zip(*columns)))
+        self.runs.append(self.write_run([records.tobytes()]))
+        self.spills += 1
+
+    def run_path(self, run):
+        """
+        :param run: Number of a run
+        :return: Path of the run's file
+        """
+        return os.path.join(self.directory.name, f"run-{run}.bin")
+
+    def write_run(self, blocks):
+        """
+        Writes a new run file.
+        :param blocks: Iterable of bytes of packed records
+        :return: Number of the new run
+        """
+        run = self.run_count
+        self.run_count += 1
+        with open(self.run_path(run), "wb") as run_file:
+            for block in blocks:
+                run_file.write(block)
+        return run
+
+    def read_run(self, run):
+        """
+        Reads a run file back one buffer at a time.
+        :param run: Number of the run
+        :return: Generator of the run's records, as tuples
+        """
+        record_bytes = 8 * self.width
+        path = self.run_path(run)
+        with open(path, "rb") as run_file:
+            while block := run_file.read(max(1, RUN_BUFFER_BYTES // record_bytes) * record_bytes):
+                values = array("d")
+                values.frombytes(block)
+                yield from zip(*(values[field::self.width] for field in range(self.width)))
+            os.remove(path)  # Each run is read exactly once
+
+    def merge(self):
+        """
+        Merges the spilled runs. While there are more runs than the fan-in, groups of fan_in runs
+        are merged into longer runs; the last fan_in or fewer runs are merged as they are read.
+        :return: Generator of all records in sorted order
+        """
+        while len(self.runs) > self.fan_in:
+            self.passes += 1
+            runs, self.runs = self.runs, []
+            for group_start in range(0, len(runs), self.fan_in):
+                group = runs[group_start:group_start + self.fan_in]
+                self.runs.append(self.write_run(self.packed_blocks(heapq.merge(*map(self.read_run, group)))))
+                self.merges.append((self.passes, group, self.runs[-1]))
+        return heapq.merge(*map(self.read_run, self.runs))
+
+    def packed_blocks(self, records):
+        """
+        Packs records into bytes a buffer at a time.
+        :param records: Iterable of records
+        :return: Generator of bytes of packed records
+        """
+        buffer_records = max(1, RUN_BUFFER_BYTES // (8 * self.width))
+        block = []
+        for record in records:
+            block.append(record)
+            if len(block) == buffer_records:
+                yield array("d", chain.from_iterable(block)).tobytes()
+                block = []
+        if block:
+            yield array("d", chain.from_iterable(block)).tobytes()
+
+    def close(self):
+        """
+        Removes the temporary run files.
+        """
+        self.directory.cleanup()
+
@@ -0,0 +1,136 @@
+import sys
+import json
+import time
+import pstats
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+
+PROFILERS = ("cprofile", "tracemalloc")
+PROFILE_LINES = 25  # Functions or allocation sites listed by a profile report
+
+
+class Metrics:
+
+    def __init__(self, enabled=True, phase_memory=False):
+        """
+        Collects counters and phase timings of one run.
+        Counters are derived from loop indices and added once per run, chunk or merge, never per
+        comparison, so the hot loops pay nothing for them. Instrumentation that would cost time
+        inside a loop is only switched on when enabled is set.
+        :param enabled: Collect anything at all; a disabled Metrics ignores every call
+        :param phase_memory: Also record the peak memory each phase allocates, as a "<phase>_peak_bytes"
+                             counter, while tracemalloc is tracing
+        """
+        self.enabled = enabled
+        self.phase_memory = enabled and phase_memory
+        self.counters = {}  # Counter name -> value
+        self.timings = {}  # Phase name -> seconds
+
+    def count(self, name, value=1):
+        """
+        Adds value to a counter.
+        :param name: Counter name
+        :param value: Amount to add
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def maximum(self, name, value):
+        """
+        Raises a counter to value if value is larger.
+        :param name: Counter name
+        :param value: Candidate maximum
+        """
+        if self.enabled:
+            self.counters[name] = max(self.counters.get(name, value), value)
+
+    def add_time(self, name, seconds):
+        """
+        Adds time to a phase.
+        :param name: Phase name
+        :param seconds: Time spent in the phase
+        """
+        if self.enabled:
+            self.timings[name] = self.timings.get(name, 0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Times the body of a with statement as a phase.
+        :param name: Phase name
+        """
+        tracing = self.phase_memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            start_bytes = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+            if tracing:
+                self.maximum(f"{name}_peak_bytes", tracemalloc.get_traced_memory()[1] - start_bytes)
+
+    def timed(self, name, function):
+        """
+        Wraps a function so the time spent in its calls is added to a phase.
+        :param name: Phase name
+        :param function: Function to wrap
+        :return: function itself when disabled, else the timing wrapper
+        """
+        if not self.enabled:
+            return function
+
+        def timed_function(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add_time(name, time.perf_counter() - start)
+        return timed_function
+
+    def write(self, program, path):
+        """
+        Writes the counters and phase timings as JSON.
+        :param program: Name of the program the metrics are of
+        :param path: File to write, or "-" for standard error
+        """
+        report = json.dumps({"program": program, "counters": self.counters,
+                             "phases": {name: round(seconds, 6) for name, seconds in self.timings.items()}})
+        if path == "-":
+            print(report, file=sys.stderr)
+        else:
+            with open(path, "w") as report_file:
+                report_file.write(report + "\n")
+
+
+NO_METRICS = Metrics(enabled=False)  # Default for runs without --metrics
+
+
+def run_profiled(profiler, function):
+    """
+    Calls function, under a profiler if one is given, and writes the profile to standard error.
+    :param profiler: "cprofile", "tracemalloc" or None
+    :param function: Function to call without arguments
+    """
+    if profiler == "cprofile":
+        profile = cProfile.Profile()
+        try:
+            profile.runcall(function)
+        finally:
+            pstats.Stats(profile, stream=sys.stderr).sort_stats("cumulative").print_stats(PROFILE_LINES)
+    elif profiler == "tracemalloc":
+        tracemalloc.start()
+        try:
+            function()
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"memory in use = {current} bytes, peak = {peak} bytes; largest allocation sites:",
+                  file=sys.stderr)
+            for statistic in snapshot.statistics("lineno")[:PROFILE_LINES]:
+                print(statistic, file=sys.stderr)
+    else:
+        function()
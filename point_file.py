@@ -0,0 +1,136 @@
+import os
+import sys
+import mmap
+import stat
+import shutil
+import struct
+import tempfile
+from array import array
+
+from point_set import select
+
+try:
+    import numpy as np
+except ImportError:  # Columns are packed with array('d') without NumPy
+    np = None
+
+# A binary point file is a header followed by two packed little-endian float64 columns:
+# count x-coordinates, then count y-coordinates. The columns start 8-byte aligned, so a
+# memory-mapped file is used in place without parsing or copying.
+MAGIC = b"PNTS"
+DTYPE = b"<f8\0"  # NumPy dtype string of the columns, padded to 4 bytes
+HEADER = struct.Struct("<4s4sQ")  # magic, dtype, number of points
+WRITE_BLOCK_POINTS = 1 << 16  # Points per write() call when writing a column
+
+
+def is_point_file(stream):
+    """
+    Checks whether a stream holds a binary point file, without consuming any of it.
+    :param stream: Buffered binary stream, e.g. sys.stdin.buffer
+    :return: True if the stream starts with the binary point file magic
+    """
+    return stream.peek(len(MAGIC))[:len(MAGIC)] == MAGIC
+
+
+def map_points(stream):
+    """
+    Loads a binary point file. A regular file is memory-mapped and its columns are used in place;
+    any other stream, e.g. a pipe, is read into memory first.
+    :param stream: Buffered binary stream positioned at the start of the file
+    :return: (xs, ys) memoryviews of float64
+    """
+    if stat.S_ISREG(os.fstat(stream.fileno()).st_mode) and stream.tell() == 0:
+        return columns(mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ))
+    return columns(stream.read())
+
+
+def columns(buffer):
+    """
+    Finds the coordinate columns of a binary point file.
+    :param buffer: Contents of the file, e.g. an mmap or bytes
+    :return: (xs, ys) memoryviews of float64 into buffer
+    """
+    if len(buffer) < HEADER.size:
+        raise ValueError("binary point file is truncated: no complete header")
+    magic, dtype, count = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError("not a binary point file")
+    if dtype != DTYPE:
+        raise ValueError(f"unsupported binary point dtype {dtype.rstrip(bytes(1)).decode(errors='replace')}")
+    column_bytes = 8 * count
+    if len(buffer) < HEADER.size + 2 * column_bytes:
+        raise ValueError(f"binary point file is truncated: the header says {count} points")
+
+    view = memoryview(buffer)
+    xs = view[HEADER.size:HEADER.size + column_bytes].cast("d")
+    ys = view[HEADER.size + column_bytes:HEADER.size + 2 * column_bytes].cast("d")
+    if sys.byteorder != "little":  # Only here do the columns have to be copied
+        xs, ys = array("d", xs.tobytes()), array("d", ys.tobytes())
+        xs.byteswap()
+        ys.byteswap()
+        xs, ys = memoryview(xs), memoryview(ys)
+    return xs, ys
+
+
+def release_points(mapping, count, start, stop):
+    """
+    Drops the pages holding points start to stop - 1 of a memory-mapped binary point file from
+    the process's resident memory, once they are no longer needed. The file is not changed; the
+    pages are read back from it if they are used again. Does nothing where madvise() is missing.
+    :param mapping: mmap of the whole binary point file
+    :param count: Number of points in the file
+    :param start: Index of the first point to drop
+    :param stop: Index after the last point to drop
+    """
+    if not hasattr(mmap, "MADV_DONTNEED"):
+        return
+    for column_start in (HEADER.size, HEADER.size + 8 * count):
+        # Only whole pages are dropped; the pages at either end may still hold points in use
+        first_page = -(-(column_start + 8 * start) // mmap.PAGESIZE) * mmap.PAGESIZE
+        end_page = (column_start + 8 * stop) // mmap.PAGESIZE * mmap.PAGESIZE
+        if end_page > first_page:
+            mapping.madvise(mmap.MADV_DONTNEED, first_page, end_page - first_page)
+
+
+def write_point_file(stream, points, order):
+    """
+    Writes points as a binary point file.
+    :param stream: Binary stream to write to, e.g. sys.stdout.buffer
+    :param points: PointSet
+    :param order: Indices of the points to write, in output order
+    """
+    stream.write(HEADER.pack(MAGIC, DTYPE, len(order)))
+    for values in (points.xs, points.ys):
+        for block_start in range(0, len(order), WRITE_BLOCK_POINTS):
+            stream.write(pack_column(select(values, order[block_start:block_start + WRITE_BLOCK_POINTS])))
+
+
+def write_point_blocks(stream, count, blocks):
+    """
+    Writes points that arrive block by block as a binary point file. The x-column goes straight
+    to the stream while the y-column is held in a temporary file until the x-column is complete.
+    :param stream: Binary stream to write to, e.g. sys.stdout.buffer
+    :param count: Total number of points in blocks
+    :param blocks: Iterable of (xs, ys) sequences of floats
+    """
+    stream.write(HEADER.pack(MAGIC, DTYPE, count))
+    with tempfile.TemporaryFile() as y_column:
+        for xs, ys in blocks:
+            stream.write(pack_column(xs))
+            y_column.write(pack_column(ys))
+        y_column.seek(0)
+        shutil.copyfileobj(y_column, stream)
+
+
+def pack_column(values):
+    """
+    :param values: Sequence of floats
+    :return: The values as packed little-endian float64 bytes
+    """
+    if np is not None:
+        return np.asarray(values, dtype="<f8").tobytes()
+    packed = array("d", values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
@@ -0,0 +1,284 @@
+import re
+import mmap
+import queue
+import threading
+from array import array
+
+from point_set import PointSet
+from point_file import WRITE_BLOCK_POINTS, is_point_file, map_points, release_points, write_point_file
+
+try:
+    import numpy as np
+except ImportError:  # Falls back to array('d') without NumPy
+    np = None
+
+MAX_REPORTED_LINES = 10  # Malformed line numbers listed in an error message
+READ_AHEAD_POLL_SECONDS = 0.01  # How often a closed read_ahead() checks whether its thread has stopped
+# A line holding exactly two fields; bytes.split() whitespace is space, \t, \n, \v, \f and \r
+TWO_FIELD_LINE = re.compile(rb"^[ \t\v\f\r]*[^\s]+[ \t\v\f\r]+[^\s]+[ \t\v\f\r]*$", re.MULTILINE)
+
+
+def load_points(stream):
+    """
+    Reads a point file and parses all coordinates in bulk.
+    Each line holds the x- and y-coordinate of one point. An optional first line holding only the
+    number of points (as in input-points.txt) limits how many points are read.
+    Binary point files (see point_file.py) are recognized by their header and memory-mapped instead.
+    :param stream: Binary stream to read, e.g. sys.stdin.buffer
+    :return: (xs, ys) flat float arrays, NumPy arrays when NumPy is installed and array('d') otherwise,
+             or memoryviews of a binary point file
+    """
+    if is_point_file(stream):
+        return map_points(stream)
+    return parse_points(stream.read())
+
+
+def parse_points(data):
+    """
+    Parses point file contents; see load_points().
+    :param data: Contents of a point file as bytes
+    :return: (xs, ys) flat float arrays
+    """
+    count, data, first_line_number = split_count_header(data)
+    return parse_point_lines(data, first_line_number, count)
+
+
+def iter_points(stream, block_bytes):
+    """
+    Reads a point file block by block, so only about block_bytes of it are held at a time.
+    Blocks are cut at line ends; the count header is handled as in load_points().
+    :param stream: Binary stream to read, e.g. sys.stdin.buffer
+    :param block_bytes: Bytes read per block
+    :return: Generator of (xs, ys) flat float arrays, one pair per block, in input order
+    """
+    if is_point_file(stream):  # Already mapped; blocks are slices of the columns
+        xs, ys = map_points(stream)
+        block_points = max(1, block_bytes // (xs.itemsize + ys.itemsize))
+        for block_start in range(0, len(xs), block_points):
+            block_stop = min(block_start + block_points, len(xs))
+            yield xs[block_start:block_stop], ys[block_start:block_stop]
+            if isinstance(xs.obj, mmap.mmap):  # The caller is done with the block; keep memory bounded
+                release_points(xs.obj, len(xs), block_start, block_stop)
+        return
+
+    count, pending, line_number = split_count_header(stream.readline())
+    while count != 0:
+        block = stream.read(block_bytes)
+        data = pending + block
+        if block:
+            line_end = data.rfind(b"\n") + 1
+            if line_end == 0:
+                pending = data  # No line ends in this block yet
+                continue
+            data, pending = data[:line_end], data[line_end:]
+        if data:
+            xs, ys = parse_point_lines(data, line_number, count)
+            line_number += data.count(b"\n")
+            if count is not None:
+                count -= len(xs)
+            if len(xs):
+                yield xs, ys
+        if not block:
+            return
+
+
+def read_ahead(blocks, depth):
+    """
+    Iterates over blocks in a background thread, so the next blocks are read and parsed while the
+    caller works on the current one. Reading from a pipe releases the GIL, so a slow producer
+    upstream no longer leaves the caller idle. An error raised by blocks is raised by the generator.
+    Closing the generator early stops the thread once it has finished reading its current block.
+    :param blocks: Iterable of blocks, e.g. iter_points()
+    :param depth: Number of blocks the thread may get ahead of the caller
+    :return: Generator of the blocks, in order
+    """
+    pending = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()  # Put after the last block
+
+    def produce():
+        try:
+            for block in blocks:
+                if stop.is_set():
+                    return
+                pending.put((block, None))
+        except BaseException as error:
+            pending.put((None, error))
+        else:
+            pending.put((done, None))
+
+    reader = threading.Thread(target=produce, daemon=True)
+    reader.start()
+    try:
+        while True:
+            block, error = pending.get()
+            if error is not None:
+                raise error
+            if block is done:
+                return
+            yield block
+    finally:
+        stop.set()
+        while reader.is_alive():
+            try:
+                pending.get_nowait()  # Makes room for a put() the thread may be blocked in
+            except queue.Empty:
+                reader.join(READ_AHEAD_POLL_SECONDS)
+
+
+def iter_point_lines(stream):
+    """
+    Reads a point file line by line, so every point is available as soon as its line arrives,
+    e.g. from a pipe or a socket. The count header is handled as in load_points().
+    A binary point file has no lines; it is loaded whole, as by load_points(), and its points follow.
+    :param stream: Buffered binary stream to read, e.g. sys.stdin.buffer
+    :return: Generator of (x, y) tuples of floats, in input order
+    """
+    if is_point_file(stream):
+        yield from zip(*map_points(stream))
+        return
+    count, line, line_number = split_count_header(stream.readline())
+    if count is not None:
+        line = stream.readline()  # The header line was the whole first line
+    while count != 0 and line:
+        fields = line.split()
+        if fields:
+            if len(fields) != 2:
+                check_lines(line, line_number)
+            try:
+                point = float(fields[0]), float(fields[1])
+            except ValueError:
+                check_lines(line, line_number)
+                raise
+            yield point
+            if count is not None:
+                count -= 1
+        line = stream.readline()
+        line_number += 1
+
+
+def split_count_header(data):
+    """
+    Splits off the optional count header line.
+    :param data: Contents of a point file as bytes, or at least its first line
+    :return: (number of points from the header or None, the point lines, line number of the first point line)
+    """
+    first_line_end = data.find(b"\n")
+    first_line = data if first_line_end == -1 else data[:first_line_end]
+    if len(first_line.split()) != 1:
+        return None, data, 1
+    try:
+        count = int(first_line)
+    except ValueError:
+        raise ValueError(f"malformed point on line 1: {first_line.decode(errors='replace').strip()}")
+    return count, b"" if first_line_end == -1 else data[first_line_end + 1:], 2
+
+
+def parse_point_lines(data, first_line_number, count=None):
+    """
+    Parses point lines without a count header.
+    The whole input is split and converted at once. Lines are only looked at one by one when some
+    line does not hold two fields or a field is not a number, to report which lines are malformed.
+    :param data: Point lines as bytes
+    :param first_line_number: Line number of the first line in data
+    :param count: Maximum number of points to parse, or None for all of them; the lines after the
+                  count-th point are ignored
+    :return: (xs, ys) flat float arrays
+    """
+    if count is not None:
+        data = cut_point_lines(data, count)
+    tokens = data.split()
+    if not fields_in_pairs(data, len(tokens)):
+        check_lines(data, first_line_number)
+
+    try:
+        values = np.array(tokens, dtype=np.float64) if np else array("d", map(float, tokens))
+    except ValueError:
+        check_lines(data, first_line_number)
+        raise
+    return values[0::2], values[1::2]
+
+
+def cut_point_lines(data, count):
+    """
+    Cuts point lines after the count-th point, i.e. the count-th line that is not blank.
+    :param data: Point lines as bytes
+    :param count: Number of points to keep
+    :return: data up to the end of the count-th point's line, or all of it if it holds no more points
+    """
+    end = 0  # End of the lines kept so far
+    while count > 0:
+        if data.count(b"\n", end) + (not data.endswith(b"\n")) <= count:
+            return data  # No line after the count-th point
+        lines = data[end:].split(b"\n", count)
+        stop = len(data) - len(lines[-1])
+        count -= len(data[end:stop].split()) // 2  # Blank lines hold no point, so more lines are needed
+        end = stop
+    return data[:end]
+
+
+def fields_in_pairs(data, token_count):
+    """
+    Checks that every line holds two fields or none, without looking at the lines one by one.
+    :param data: Point lines as bytes
+    :param token_count: Number of fields in data, len(data.split())
+    :return: True if no line holds one field or more than two
+    """
+    if np is None:
+        return 2 * len(TWO_FIELD_LINE.findall(data)) == token_count
+    text = np.frombuffer(data, dtype=np.uint8)
+    space = (text == 32) | (text - np.uint8(9) < 5)  # The bytes.split() whitespace, \t to \r and space
+    starts = np.flatnonzero(space[:-1] & ~space[1:]) + 1  # Positions where a field starts
+    if len(text) and not space[0]:
+        starts = np.concatenate(([0], starts))
+    lines = np.searchsorted(np.flatnonzero(text == 10), starts)  # Line of every field
+    # Fields pair up within a line, and the next pair starts on a later line
+    return len(lines) % 2 == 0 and np.array_equal(lines[0::2], lines[1::2]) \
+        and bool(np.all(lines[2::2] > lines[1:-1:2]))
+
+
+def check_lines(data, first_line_number):
+    """
+    Raises ValueError naming the lines that do not hold exactly two numbers.
+    :param data: Point lines as bytes
+    :param first_line_number: Line number of the first line in data
+    """
+    malformed = []
+    for line_number, line in enumerate(data.splitlines(), first_line_number):
+        fields = line.split()
+        if not fields:
+            continue  # Blank lines are allowed
+        try:
+            if len(fields) == 2:
+                float(fields[0])
+                float(fields[1])
+                continue
+        except ValueError:
+            pass
+        malformed.append(line_number)
+    if malformed:
+        listed = ", ".join(map(str, malformed[:MAX_REPORTED_LINES]))
+        more = f" and {len(malformed) - MAX_REPORTED_LINES} more" if len(malformed) > MAX_REPORTED_LINES else ""
+        raise ValueError(f"malformed point on line(s) {listed}{more}: expected an x- and a y-coordinate")
+
+
+def convert_point_file(source_path, target_path, target_format):
+    """
+    Converts a point file, text or binary, to the given format, so a dataset is parsed only once.
+    Text is written as one "x y" line per point in full precision; converting it back gives the same
+    coordinates.
+    :param source_path: Point file to read, text (with or without a count header) or binary
+    :param target_path: Point file to write
+    :param target_format: "binary" or "text"
+    """
+    with open(source_path, "rb") as source:
+        xs, ys = load_points(source)
+    if target_format == "binary":
+        with open(target_path, "wb") as target:
+            write_point_file(target, PointSet(xs, ys), range(len(xs)))
+        return
+    with open(target_path, "w") as target:
+        for block_start in range(0, len(xs), WRITE_BLOCK_POINTS):
+            block_stop = block_start + WRITE_BLOCK_POINTS
+            target.write("".join(f"{x} {y}\n" for x, y in zip(xs[block_start:block_stop].tolist(),
+                                                                ys[block_start:block_stop].tolist())))
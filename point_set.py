@@ -0,0 +1,129 @@
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # PointSet works on array('d') alone
+    np = None
+
+
+class Point:
+    __slots__ = ("x", "y")
+
+    def __init__(self, x, y):
+        """
+        Defines x and y variables
+        :param x: x-coordinate
+        :param y: y-coordinate
+        """
+        self.x = x
+        self.y = y
+
+    def __repr__(self):
+        """Defines how a point should print"""
+        return "%s %s" % (self.x, self.y)
+
+    def get_x(self):
+        """
+        :return: The x-coordinate of a point
+        """
+        return self.x
+
+    def get_y(self):
+        """
+        :return: The y-coordinate of a point
+        """
+        return self.y
+
+
+class PointSet:
+
+    def __init__(self, xs, ys, point_class=Point):
+        """
+        Stores points as two flat array('d') buffers instead of one object per point.
+        Algorithms work on the points by index; indexing the set builds a Point view on demand.
+        :param xs: x-coordinates, as array('d'), a float64 memoryview, a NumPy array or any sequence of floats
+        :param ys: y-coordinates, parallel to xs
+        :param point_class: Point subclass built when the set is indexed
+        """
+        self.xs = to_float_array(xs)
+        self.ys = to_float_array(ys)
+        self.point_class = point_class
+
+    def __len__(self):
+        """
+        :return: Number of points in the set
+        """
+        return len(self.xs)
+
+    def __getitem__(self, index):
+        """
+        :param index: Index of a point
+        :return: A new point_class instance holding the point's coordinates
+        """
+        return self.point_class(self.xs[index], self.ys[index])
+
+    def nbytes(self):
+        """
+        :return: Bytes taken by the coordinate buffers
+        """
+        return (len(self.xs) + len(self.ys)) * self.xs.itemsize
+
+    def copy_range(self, start, stop):
+        """
+        Copies a range of the points into array('d') buffers, e.g. to send them to another process.
+        :param start: Index of the first point
+        :param stop: Index after the last point
+        :return: New PointSet of the points start to stop - 1
+        """
+        xs = array("d")
+        ys = array("d")
+        xs.frombytes(memoryview(self.xs[start:stop]).cast("B"))
+        ys.frombytes(memoryview(self.ys[start:stop]).cast("B"))
+        return PointSet(xs, ys, self.point_class)
+
+    def numpy(self):
+        """
+        Wraps the coordinate buffers as NumPy arrays without copying them.
+        :return: (xs, ys) NumPy arrays
+        """
+        return np.frombuffer(self.xs, dtype=np.float64), np.frombuffer(self.ys, dtype=np.float64)
+
+    def order_by_x(self):
+        """
+        Sorts the point indices by x-coordinate; points with equal x keep their input order.
+        :return: array('q') of point indices
+        """
+        if np is not None:
+            return array("q", np.argsort(self.numpy()[0], kind="stable").astype(np.int64).tobytes())
+        return array("q", sorted(range(len(self.xs)), key=self.xs.__getitem__))
+
+
+def select(values, indices):
+    """
+    Picks coordinates by point index, e.g. to put a column in sorted order.
+    :param values: Column of coordinates (array('d'), a float64 memoryview or a NumPy array)
+    :param indices: Indices to pick (a list, range, array('q') or NumPy array)
+    :return: The picked coordinates, in the order of indices: a NumPy array when NumPy is installed
+             and array('d') otherwise
+    """
+    if np is not None:
+        return np.frombuffer(values, dtype=np.float64)[np.asarray(indices, dtype=np.intp)]
+    return array("d", map(values.__getitem__, indices))
+
+
+def to_float_array(values):
+    """
+    Converts coordinates to a compact array('d'), without copying if they already are one or are a
+    float64 memoryview.
+    :param values: array('d'), a float64 memoryview, a NumPy array or any sequence of floats
+    :return: array('d') or memoryview of the values
+    """
+    if isinstance(values, array) and values.typecode == "d":
+        return values
+    if isinstance(values, memoryview) and values.format == "d":
+        return values  # A column of a memory-mapped binary point file
+    if np is not None and isinstance(values, np.ndarray):
+        converted = array("d")
+        converted.frombytes(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+        return converted
+    return array("d", values)
@@ -0,0 +1,56 @@
+import math
+
+from point_set import select
+
+try:
+    import numpy as np
+except ImportError:  # Falls back to a list comprehension without NumPy
+    np = None
+
+OUTPUT_BLOCK_POINTS = 1 << 16  # Points formatted and written per write() call
+# Coordinates below this magnitude may print in scientific notation; the exact rule is then
+# checked with log10 so values right at the boundary round the same way they always have
+SCIENTIFIC_CANDIDATE_LIMIT = 1.001e-3
+
+
+def write_points(stream, points, order):
+    """
+    Writes points one per line as "x y". Coordinates whose exponent is < -3 are written in
+    scientific notation with four decimals, e.g. 6.2832E-4. Each block of points is formatted as
+    a batch and written with a single call.
+    :param stream: Text stream to write to, e.g. sys.stdout
+    :param points: PointSet
+    :param order: Indices of the points to write, in output order
+    """
+    for block_start in range(0, len(order), OUTPUT_BLOCK_POINTS):
+        block = order[block_start:block_start + OUTPUT_BLOCK_POINTS]
+        x_texts = format_coordinates(select(points.xs, block).tolist())
+        y_texts = format_coordinates(select(points.ys, block).tolist())
+        stream.write("\n".join(map(" ".join, zip(x_texts, y_texts))) + "\n")
+
+
+def format_coordinates(values):
+    """
+    Formats coordinates the way angular-sort.py prints them.
+    :param values: List of floats
+    :return: List of strings, parallel to values
+    """
+    texts = list(map(str, values))
+    for index in scientific_indices(values):
+        texts[index] = "{:.4E}".format(values[index]).replace("E-0", "E-")
+    return texts
+
+
+def scientific_indices(values):
+    """
+    Finds the coordinates to print in scientific notation: those that are not 0 and whose
+    exponent is < -3. A vectorized magnitude check picks the few candidates first.
+    :param values: List of floats
+    :return: Indices of the values to print in scientific notation
+    """
+    if np is not None:
+        magnitudes = np.abs(np.asarray(values, dtype=np.float64))
+        candidates = np.flatnonzero((magnitudes != 0) & (magnitudes < SCIENTIFIC_CANDIDATE_LIMIT)).tolist()
+    else:
+        candidates = [index for index, value in enumerate(values) if 0 < abs(value) < SCIENTIFIC_CANDIDATE_LIMIT]
+    return [index for index in candidates if math.floor(math.log10(abs(values[index]))) < -3]
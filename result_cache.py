@@ -0,0 +1,258 @@
+import io
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+from contextlib import contextmanager, nullcontext, redirect_stdout
+
+from metrics import NO_METRICS
+
+try:
+    import fcntl
+except ImportError:  # Concurrent runs are not serialized without it, e.g. on Windows
+    fcntl = None
+
+# The cache is a directory of entries, one subdirectory per key holding the files of one result.
+# An entry is written to a hidden pending directory and renamed into place, so it is either complete
+# or missing. Its modification time is its last use; the least recently used entries are evicted.
+CACHE_VERSION = 1  # Part of every key; bumped when the cached files change meaning
+DEFAULT_CACHE_SIZE = "1G"  # Default --cache-size
+HASH_BLOCK_BYTES = 1 << 20  # Bytes of input hashed at a time
+OUTPUT_FILE = "output"  # Standard output of the run
+TRACE_FILE = "trace"  # TimSort information file of the run, if it wrote one
+STATS_FILE = "stats.json"  # Hits, misses and evictions over all runs
+LOCK_FILE = "lock"  # Serializes stores, evictions and statistics updates
+
+
+class ResultCache:
+
+    def __init__(self, directory, max_bytes, metrics=NO_METRICS):
+        """
+        On-disk cache of program results, addressed by a hash of the input bytes and the options
+        that shape the result. A hit writes the cached files back as they are, without parsing or
+        computing anything.
+        :param directory: Cache directory, created if missing
+        :param max_bytes: Size the entries are kept within by evicting the least recently used
+        :param metrics: Metrics the hits, misses and evictions of this run are counted in
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.metrics = metrics
+        os.makedirs(directory, exist_ok=True)
+
+    def run(self, program, options, input_stream, trace_path, compute):
+        """
+        Writes the result of a run to standard output and trace_path, from the cache if it holds
+        the result and else by calling compute, whose result is then stored.
+        :param program: Name of the program, part of the key
+        :param options: Dict of the options that shape the result, part of the key
+        :param input_stream: Binary stream the input is read from, e.g. sys.stdin.buffer
+        :param trace_path: Information file the run writes, or None
+        :param compute: Function called with a binary input stream on a miss; writes the result to
+                        sys.stdout and trace_path
+        """
+        with self.spooled(input_stream) as input_stream:
+            with self.metrics.phase("hash"):
+                key = self.key(program, options, input_stream)
+            entry = self.lookup(key)
+            if entry is not None:
+                with self.metrics.phase("output"):
+                    self.replay(entry, trace_path)
+                return
+
+            pending = tempfile.mkdtemp(prefix=".pending-", dir=self.directory)
+            try:
+                with open(os.path.join(pending, OUTPUT_FILE), "w+b") as output:
+                    stdout = io.TextIOWrapper(output, encoding=sys.stdout.encoding, errors=sys.stdout.errors)
+                    with redirect_stdout(stdout):
+                        compute(input_stream)
+                    stdout.flush()
+                    stdout.detach()
+                    output.seek(0)
+                    sys.stdout.flush()
+                    shutil.copyfileobj(output, sys.stdout.buffer)
+                if trace_path is not None:
+                    shutil.copyfile(trace_path, os.path.join(pending, TRACE_FILE))
+                self.store(key, pending)
+            finally:
+                shutil.rmtree(pending, ignore_errors=True)  # Gone already if it was stored
+
+    @contextmanager
+    def spooled(self, input_stream):
+        """
+        Makes an input stream rewindable. A regular file is used as it is; any other stream, e.g.
+        a pipe, is copied to a temporary file, which is removed afterwards.
+        :param input_stream: Binary stream positioned at the start of the input
+        :return: Context manager giving a seekable binary stream
+        """
+        if input_stream.seekable():
+            yield input_stream
+            return
+        with tempfile.TemporaryFile(prefix="cache-input-") as spool:
+            shutil.copyfileobj(input_stream, spool)
+            spool.seek(0)
+            yield spool
+
+    def key(self, program, options, input_stream):
+        """
+        Hashes the input and the options, then rewinds the input.
+        :param program: Name of the program
+        :param options: Dict of the options that shape the result
+        :param input_stream: Seekable binary stream positioned at the start of the input
+        :return: Hex SHA-256 digest
+        """
+        digest = hashlib.sha256(json.dumps([CACHE_VERSION, program, options], sort_keys=True).encode() + b"\0")
+        start = input_stream.tell()
+        while block := input_stream.read(HASH_BLOCK_BYTES):
+            digest.update(block)
+        input_stream.seek(start)
+        return digest.hexdigest()
+
+    def lookup(self, key):
+        """
+        Finds the entry of a key and marks it as just used.
+        :param key: Hex digest from key()
+        :return: Path of the entry, or None on a miss
+        """
+        entry = os.path.join(self.directory, key)
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            self.record("misses")
+            return None
+        self.record("hits")
+        return entry
+
+    def replay(self, entry, trace_path):
+        """
+        Writes the files of a cached entry back: its output to standard output and its trace to trace_path.
+        :param entry: Path of the entry
+        :param trace_path: Information file to write, or None
+        """
+        if trace_path is not None:
+            shutil.copyfile(os.path.join(entry, TRACE_FILE), trace_path)
+        sys.stdout.flush()
+        with open(os.path.join(entry, OUTPUT_FILE), "rb") as output:
+            shutil.copyfileobj(output, sys.stdout.buffer)
+
+    def store(self, key, pending):
+        """
+        Moves a complete pending entry into place and evicts the least recently used entries until
+        the cache fits its size again. An entry larger than the whole cache is not stored.
+        :param key: Hex digest from key()
+        :param pending: Directory holding the entry's files
+        """
+        if entry_bytes(pending) > self.max_bytes:
+            return
+        with self.locked():
+            try:
+                os.rename(pending, os.path.join(self.directory, key))
+            except OSError:  # Another run stored the same result first
+                return
+            self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries while the entries take more than max_bytes.
+        Called with the lock held.
+        """
+        entries = []  # (last use, bytes, path) of every entry
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.startswith(".") and os.path.isdir(path):
+                entries.append((os.stat(path).st_mtime_ns, entry_bytes(path), path))
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        evictions = 0
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total_bytes -= size
+            evictions += 1
+        if evictions:
+            self.record("evictions", evictions, locked=True)
+
+    def record(self, event, count=1, locked=False):
+        """
+        Counts hits, misses or evictions, both in the run's metrics and in the cache's statistics file.
+        :param event: "hits", "misses" or "evictions"
+        :param count: Number of events
+        :param locked: True if the caller holds the lock already
+        """
+        self.metrics.count(f"cache_{event}", count)
+        with (nullcontext() if locked else self.locked()):
+            stats = self.stats()
+            stats[event] += count
+            with open(os.path.join(self.directory, STATS_FILE), "w") as stats_file:
+                json.dump(stats, stats_file)
+
+    def stats(self):
+        """
+        :return: Dict of the hits, misses and evictions over all runs
+        """
+        stats = {"hits": 0, "misses": 0, "evictions": 0}
+        try:
+            with open(os.path.join(self.directory, STATS_FILE)) as stats_file:
+                stats.update(json.load(stats_file))
+        except (FileNotFoundError, ValueError):  # A new cache, or a run interrupted while writing
+            pass
+        return stats
+
+    @contextmanager
+    def locked(self):
+        """
+        Holds the cache's lock file for the body of a with statement.
+        """
+        with open(os.path.join(self.directory, LOCK_FILE), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+
+def entry_bytes(path):
+    """
+    :param path: Directory of an entry
+    :return: Total size of the entry's files
+    """
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def parse_args():
+    """
+    Parses the command line arguments.
+    :return: argparse.Namespace with directory and clear
+    """
+    parser = argparse.ArgumentParser(description="Reports the size, entries, hits, misses and evictions of a result "
+                                                 "cache written by angular-sort.py or closest.py with --cache.")
+    parser.add_argument("directory", help="cache directory")
+    parser.add_argument("--clear", action="store_true", help="remove every entry and reset the statistics")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not os.path.isdir(args.directory):
+        sys.exit(f"result_cache.py: {args.directory}: no such cache directory")
+    cache = ResultCache(args.directory, 0)
+    entries = [os.path.join(args.directory, name) for name in os.listdir(args.directory)
+               if not name.startswith(".") and os.path.isdir(os.path.join(args.directory, name))]
+    if args.clear:
+        with cache.locked():
+            for entry in entries:
+                shutil.rmtree(entry, ignore_errors=True)
+            if os.path.exists(os.path.join(args.directory, STATS_FILE)):
+                os.remove(os.path.join(args.directory, STATS_FILE))
+        return
+    stats = cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    print(f"entries = {len(entries)}, size = {sum(map(entry_bytes, entries))} bytes")
+    print(f"hits = {stats['hits']}, misses = {stats['misses']}, evictions = {stats['evictions']}"
+          + (f", hit rate = {stats['hits'] / lookups:.1%}" if lookups else ""))
+
+
+if __name__ == "__main__":
+    main()
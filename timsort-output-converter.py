@@ -1,8 +1,22 @@
 
 import sys
 
+from point_file import is_point_file, map_points
+from point_loader import convert_point_file
+
+# Converting a point file between text and binary:
+#   python3 timsort-output-converter.py --to-binary points.txt points.bin
+#   python3 timsort-output-converter.py --to-text points.bin points.txt
+if len(sys.argv) == 4 and sys.argv[1] in ("--to-binary", "--to-text"):
+	convert_point_file(sys.argv[2], sys.argv[3], sys.argv[1][len("--to-"):])
+	sys.exit()
+
 filename = sys.argv[1]
-f = open(filename, 'r')
+f = open(filename, 'rb')
+if is_point_file(f):
+	for l in zip(*map_points(f)):
+		print(str(round(l[0], 16)), str(round(l[1], 16)))
+	sys.exit()
 for l in f:
 	l = l.split()
 	l[0] = float(l[0])